@@ -1,16 +1,21 @@
 import os
 import sys
+import queue
+import time
+import atexit
 import logging
-from logging.handlers import TimedRotatingFileHandler, WatchedFileHandler
+import threading
+from logging.handlers import TimedRotatingFileHandler, WatchedFileHandler, QueueHandler, QueueListener
 from flask import Flask, render_template
 from flask_socketio import SocketIO, join_room, leave_room, rooms
 from flask_cors import CORS
 
 from .config.system_settings import Settings
-from .middleware import register_error_handlers, setup_middleware
+from .middleware import register_error_handlers, setup_middleware, configure_json
 from .api.routes import register_routes
 
 socketio: SocketIO | None = None
+_log_listener: QueueListener | None = None
 
 def create_app() -> Flask:
     base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +30,7 @@ def create_app() -> Flask:
 
     _configure_logging(settings)
 
+    configure_json(app)
     setup_middleware(app)
     register_error_handlers(app)
     register_routes(app)
@@ -56,7 +62,6 @@ def create_app() -> Flask:
     # 延迟导入新的终端服务单例
     from app.services.terminal.manager import terminal_service as terminal_service_singleton  # noqa
 
-    import threading, time
     def push_output_loop():
         while True:
             try:
@@ -136,10 +141,9 @@ def create_app() -> Flask:
             if not terminal_ids:
                 return
             logging.getLogger(__name__).info("[socket] disconnect; candidate terminal rooms=%s", terminal_ids)
-            import threading, time as _time
 
             def _delayed_check(tids):
-                _time.sleep(5)
+                time.sleep(5)
                 for tid in tids:
                     try:
                         if tid in terminal_service_singleton.sessions:
@@ -207,8 +211,29 @@ def _configure_logging(settings: Settings):
             file_handler = TimedRotatingFileHandler(log_file, when='midnight', backupCount=settings.LOG_BACKUP_COUNT, encoding='utf-8')
         file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        # 文件写入交给后台线程：请求线程只负责入队，不再持有文件 I/O 与 handler 锁
+        _start_log_listener(file_handler)
+        queue_handler = QueueHandler(_log_listener.queue)
+        queue_handler.setLevel(level)
+        root_logger.addHandler(queue_handler)
     except Exception as e:
         logging.getLogger(__name__).warning(f'文件日志配置失败: {e}')
 
+
+def _start_log_listener(file_handler: logging.Handler):
+    global _log_listener
+    _stop_log_listener()
+    _log_listener = QueueListener(queue.SimpleQueue(), file_handler, respect_handler_level=True)
+    _log_listener.start()
+
+
+def _stop_log_listener():
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+atexit.register(_stop_log_listener)
+
 __all__ = ['create_app', 'socketio']
@@ -112,10 +112,11 @@ class EsbService:
         return to_xml(d)
 
 
-def get_esb():
+def get_esb(req=None):
     """Get ESB service instance based on configuration and request context.
     
-    Supports environment override via 'env' parameter in request JSON:
+    Supports environment override via 'env' parameter in request JSON
+    (pass the already-parsed body as ``req`` to avoid reading it again):
     - 'sita': SIT-A environment (12.99.223.102:39030)
     - 'sitb': SIT-B environment (12.99.223.101:39030)
     - 'uat': UAT environment (app.esb.nb:39030)
@@ -127,7 +128,7 @@ def get_esb():
     cfg = current_app.config
 
     # 允许请求中带 env 参数指定 ESB 地址
-    override = request.get_json(silent=True) or {}
+    override = (req if req is not None else request.get_json(silent=True)) or {}
     env = override.get("env", "").replace("-", "")
 
     if env == 'sita':
@@ -206,7 +207,7 @@ def balance_query():
             }
         }
         
-        ok, res = get_esb().send("00000752", "bp186L", head, body)
+        ok, res = get_esb(req).send("00000752", "bp186L", head, body)
         
         return jsonify({
             "success": ok,
@@ -272,7 +273,7 @@ def query_detail():
             "EndDt": req.get("endDate", ""),
         }
         
-        ok, res = get_esb().send("00000741", "cb186Y", head, body)
+        ok, res = get_esb(req).send("00000741", "cb186Y", head, body)
         
         return jsonify({
             "success": ok,
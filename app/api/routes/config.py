@@ -4,23 +4,24 @@ from __future__ import annotations
 
 from flask import Blueprint, request
 from app.middleware import api_response
-from app.services import ConfigService
-from app.config.system_settings import Settings
+from app.services import get_config_service
 from datetime import datetime
 
 config_bp = Blueprint('config', __name__)
-_config_service = ConfigService(Settings().CONFIG_FILE_PATH)
+_config_service = get_config_service()
 
 
 @config_bp.route('/config', methods=['GET'])
 @api_response
 def get_config():
 	cfg = _config_service.load_config() or {}
+	# load_config 返回共享的缓存对象：脱敏时复制，不能原地修改
+	logs = []
 	for log in cfg.get('logs', []):
-		for ssh in log.get('sshs', []) or []:
-			if 'password' in ssh:
-				ssh['password'] = '***'
-	return cfg
+		if log.get('sshs'):
+			log = {**log, 'sshs': [{**ssh, 'password': '***'} if 'password' in ssh else ssh for ssh in log['sshs']]}
+		logs.append(log)
+	return {**cfg, 'logs': logs}
 
 
 @config_bp.route('/config', methods=['PUT'])
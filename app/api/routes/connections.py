@@ -4,25 +4,15 @@ from __future__ import annotations
 
 from flask import Blueprint, request
 from app.middleware import api_response
-from app.services import LogSearchService
+from app.services import get_search_service
 from datetime import datetime
 
 connections_bp = Blueprint('connections', __name__)
-_search_service: LogSearchService | None = None
-
-
-def _get_search_service() -> LogSearchService:
-	global _search_service
-	if _search_service is None:
-		_search_service = LogSearchService()
-	return _search_service
-
-
 @connections_bp.route('/connections/stats', methods=['GET'])
 @api_response
 def get_connection_stats():
-	svc = _get_search_service()
-	stats = svc.ssh_manager.get_stats()
+	# 与搜索/下载共用的连接池（此前这里单独创建的实例统计不到任何连接）
+	stats = get_search_service().ssh_manager.get_stats()
 	return {
 		'total_connections': stats['total_connections'],
 		'active_connections': stats['active_connections'],
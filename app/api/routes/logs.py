@@ -1,30 +1,46 @@
 """Logs routes (migrated) – updated to use new app.services namespace only."""
+import io
 import os
+import codecs
+import shlex
+import time
 import logging
-import io
-from flask import Blueprint, request, send_file
+import flask as _flask
+from flask import Blueprint, request, send_file, jsonify, Response
 from app.middleware import api_response
-from app.services import ConfigService, LogSearchService, SSHConnectionManager
+from app.services import get_search_service, get_config_service
 from app.models import SearchParams
+from app.services.utils.encoding import smart_decode
 from app.config.system_settings import Settings
 
 logs_bp = Blueprint('logs', __name__)
 
 _settings = Settings()
-config_service = ConfigService(_settings.CONFIG_FILE_PATH)
-search_service = LogSearchService()
+config_service = get_config_service()
+search_service = get_search_service()
+# 下载与搜索共用同一连接池，连续请求同一主机时复用已认证的 SSH 连接
+_ssh_manager = search_service.ssh_manager
 logger = logging.getLogger(__name__)
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # 流式下载分块大小
+DOWNLOAD_READ_TIMEOUT = 60       # 单次 SFTP 读取超时（秒）
+DOWNLOAD_PREFETCH_MIN_BYTES = 16 * 1024 * 1024  # 超过该大小的文件启用 SFTP 预取
+_TS_FMT = '%Y%m%d_%H%M%S'  # 下载文件名中的时间戳格式
+# 可交给远端 iconv 转码的编码（Python 编码名 -> iconv 编码名）
+_ICONV_ENCODINGS = {'gbk': 'GBK', 'gb2312': 'GB18030', 'gb18030': 'GB18030'}
+
+# send_file 的 download_name 参数自 Flask 2.0 起提供；版本在进程内不变，导入时解析一次
+_FLASK_VERSION = tuple(int(p) for p in _flask.__version__.split('.')[:3] if p.isdigit())
+_USE_DOWNLOAD_NAME = _FLASK_VERSION >= (2, 0, 0)
+
 @logs_bp.route('/logs', methods=['GET'])
 @api_response
 def list_logs():
 	include_ssh = request.args.get('include_ssh', '').lower() == 'true'
 	if include_ssh:
-		logs_summary = config_service.get_log_summary()
 		log_configs = []
-		for log in logs_summary:
-			log_config = config_service.get_log_by_name(log['name'])
-			if log_config and hasattr(log_config, 'sshs') and log_config.sshs:
+		for log_config in config_service.get_all_logs():
+			if log_config and log_config.sshs:
 				for idx, ssh_config in enumerate(log_config.sshs):
 					suffix = f"#{idx+1}" if len(log_config.sshs) > 1 else ""
 					connection_name = f"{log_config.name} - {ssh_config.get('host','unknown')}{suffix}"
@@ -59,43 +75,20 @@ def get_log_files(log_name: str):
 	log_config = config_service.get_log_by_name(log_name)
 	if not log_config:
 		raise FileNotFoundError(f'未找到日志配置: {log_name}')
-	all_files = []
+	targets = []
 	for ssh_config in log_config.sshs:
-		try:
-			log_path = ssh_config.get('path') or getattr(log_config, 'path', '') or ''
-			if not log_path:
-				continue
-			files = search_service.get_log_files(ssh_config, log_path)
-			all_files.extend(files)
-		except Exception:
-			continue
+		log_path = ssh_config.get('path') or getattr(log_config, 'path', '') or ''
+		if log_path:
+			targets.append((ssh_config, log_path))
+	# 多台主机并发列目录，结果按配置顺序合并
+	all_files = [f for files in search_service.get_log_files_multi(targets) for f in files]
 	return {'files': all_files, 'log_name': log_name, 'total_files': len(all_files)}
 
-@logs_bp.route('/logs/<log_name>/search', methods=['POST'])
-@api_response
-def search_log(log_name: str):
-	client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR', 'unknown'))
-	if ',' in client_ip:
-		client_ip = client_ip.split(',')[0].strip()
-	log_config = config_service.get_log_by_name(log_name)
-	if not log_config:
-		raise FileNotFoundError(f'未找到日志配置: {log_name}')
-	data = request.get_json() or {}
-	search_params = SearchParams(
-		keyword=data.get('keyword', ''),
-		search_mode=data.get('search_mode', 'keyword'),
-		context_span=int(data.get('context_span', 5)),
-		use_regex=bool(data.get('use_regex', False)),
-		reverse_order=bool(data.get('reverse_order', False)),
-		use_file_filter=bool(data.get('use_file_filter', False)),
-		selected_file=data.get('selected_file'),
-		selected_files=data.get('selected_files'),
-		max_lines=int(data['max_lines']) if 'max_lines' in data and str(data['max_lines']).isdigit() else None
-	)
-	# 组装目标日志信息（不打印搜索结果，仅打印目标与参数）
+def _log_search_request(client_ip, log_name, log_config, search_params):
+	"""打印搜索目标与参数（不打印搜索结果）。"""
 	try:
 		targets = []
-		sshs = getattr(log_config, 'sshs', []) or []
+		sshs = log_config.sshs
 		for ssh in sshs:
 			try:
 				host = ssh.get('host', 'unknown') if isinstance(ssh, dict) else 'unknown'
@@ -137,78 +130,128 @@ def search_log(log_name: str):
 	except Exception:
 		# 日志不能影响业务流程
 		pass
+
+@logs_bp.route('/logs/<log_name>/search', methods=['POST'])
+@api_response
+def search_log(log_name: str):
+	# access_route 已解析 X-Forwarded-For（取首个地址），无该头时回退到 REMOTE_ADDR
+	access_route = request.access_route
+	client_ip = (access_route[0] if access_route else request.remote_addr) or 'unknown'
+	log_config = config_service.get_log_by_name(log_name)
+	if not log_config:
+		raise FileNotFoundError(f'未找到日志配置: {log_name}')
+	data = request.get_json(silent=True) or {}
+	search_params = SearchParams(
+		keyword=data.get('keyword', ''),
+		search_mode=data.get('search_mode', 'keyword'),
+		context_span=int(data.get('context_span', 5)),
+		use_regex=bool(data.get('use_regex', False)),
+		reverse_order=bool(data.get('reverse_order', False)),
+		use_file_filter=bool(data.get('use_file_filter', False)),
+		selected_file=data.get('selected_file'),
+		selected_files=data.get('selected_files'),
+		max_lines=int(data['max_lines']) if 'max_lines' in data and str(data['max_lines']).isdigit() else None
+	)
+	# 组装目标日志信息（不打印搜索结果，仅打印目标与参数）；INFO 关闭时跳过整段组装
+	if logger.isEnabledFor(logging.INFO):
+		_log_search_request(client_ip, log_name, log_config, search_params)
 	result = search_service.search_multi_host(log_config.to_dict(), search_params)
-	logger.info(f"[SEARCH RESULT] IP: {client_ip} | Log: {log_name} | Matches: {result.total_results} | Time: {result.total_search_time:.3f}s")
+	logger.info("[SEARCH RESULT] IP: %s | Log: %s | Matches: %s | Time: %.3fs", client_ip, log_name, result.total_results, result.total_search_time)
 	return result.to_dict()
 
+def _sniff_encoding(sample, hint):
+	"""根据文件首块字节判断编码，hint 为远端 locale 编码"""
+	hint = (hint or 'utf-8').lower()
+	# 截到最后一个完整行，避免块尾被截断的多字节字符干扰检测
+	cut = sample.rfind(b'\n')
+	if cut > 0:
+		sample = sample[:cut + 1]
+	if not sample or sample.isascii():
+		return hint
+	_, encoding = smart_decode(sample, preferred_encoding=hint)
+	return encoding.lower()
+
 @logs_bp.route('/logs/download', methods=['GET'])
 def download_log_file():
 	host = request.args.get('host')
 	file_path = request.args.get('file_path')
 	log_name = request.args.get('log_name')
 	if not host or not file_path:
-		from flask import jsonify
 		return jsonify({'success': False,'error': {'code': 'VALIDATION_ERROR','message': '缺少必要参数: host 和 file_path'}}), 400
 	ssh_config = None
 	if log_name:
 		log_config = config_service.get_log_by_name(log_name)
-		if log_config and hasattr(log_config, 'sshs'):
-			for ssh in log_config.sshs:
-				if ssh.get('host') == host:
-					ssh_config = ssh; break
+		if log_config:
+			ssh_config = next((ssh for ssh in log_config.sshs if ssh.get('host') == host), None)
 	if not ssh_config:
-		logs_summary = config_service.get_log_summary()
-		for log in logs_summary:
-			log_config = config_service.get_log_by_name(log['name'])
-			if log_config and hasattr(log_config, 'sshs'):
-				for ssh in log_config.sshs:
-					if ssh.get('host') == host:
-						ssh_config = ssh; break
-				if ssh_config: break
+		# 未指定或未命中日志名时，在全部日志配置中查找第一个匹配的主机
+		ssh_config = next((ssh for log_config in config_service.get_all_logs() for ssh in log_config.sshs if ssh.get('host') == host), None)
 	if not ssh_config:
-		from flask import jsonify
 		return jsonify({'success': False,'error': {'code': 'NOT_FOUND','message': f'未找到主机 {host} 的SSH配置'}}), 404
 	try:
-		ssh_manager = SSHConnectionManager()
-		conn = ssh_manager.get_connection(ssh_config)
+		conn = _ssh_manager.get_connection(ssh_config)
 		if not conn:
-			from flask import jsonify
 			return jsonify({'success': False,'error': {'code': 'CONNECTION_ERROR','message': 'SSH连接失败'}}), 500
 		# 若 file_path 包含占位符，先进行解析
-		from app.services.utils.filename_resolver import resolve_log_filename
-		if any(ph in file_path for ph in ['{YYYY}', '{MM}', '{DD}', '{N}']):
+		from app.services.utils.filename_resolver import has_placeholders, resolve_log_filename
+		if has_placeholders(file_path):
 			try:
 				resolved = resolve_log_filename(file_path, ssh_conn=conn)
 				file_path = resolved
 			except Exception as _e:  # noqa
 				logger.warning(f"下载前解析文件名占位符失败: {file_path} - {_e}")
-		command = f"cat '{file_path}'"
-		stdout, stderr, exit_code = conn.execute_command(command, timeout=60)
-		if exit_code != 0:
-			from flask import jsonify
-			return jsonify({'success': False,'error': {'code': 'INTERNAL','message': f'读取文件失败: {stderr}'}}), 500
-		if not stdout:
-			stdout = ''
-		from datetime import datetime
-		file_name = os.path.basename(file_path) or 'log'
-		ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-		download_filename = f"{host}_{file_name}_{ts}"
-		if not download_filename.endswith('.log'):
-			download_filename += '.log'
-		file_obj = io.BytesIO(stdout.encode('utf-8'))
-		file_obj.seek(0)
-		import flask
-		if tuple(map(int, flask.__version__.split('.'))) >= (2,0,0):
-			return send_file(file_obj, mimetype='text/plain', as_attachment=True, download_name=download_filename)
+		# 通过 SFTP 分块流式读取，避免整文件缓冲在 worker 内存中
+		try:
+			remote_file = conn.open_file(file_path, timeout=DOWNLOAD_READ_TIMEOUT)
+		except Exception as e:
+			return jsonify({'success': False,'error': {'code': 'INTERNAL','message': f'读取文件失败: {e}'}}), 500
+		# 下载前先通过 SFTP stat 检查文件大小，超限的请求直接拒绝
+		try:
+			file_size = remote_file.size
+		except Exception as e:
+			logger.debug(f"获取远端文件大小失败: {e}")
+			file_size = None
+		max_bytes = _settings.MAX_DOWNLOAD_BYTES
+		if file_size is not None and max_bytes > 0 and file_size > max_bytes:
+			remote_file.close()
+			return jsonify({'success': False,'error': {'code': 'TOO_LARGE','message': f'文件过大（{file_size} 字节），超过下载上限 {max_bytes} 字节'}}), 413
+		# 只用首块数据探测一次文件编码（系统 UTF-8 但文件可能是 GBK），之后整条流按该编码单次转码
+		file_obj = io.BufferedReader(remote_file, buffer_size=DOWNLOAD_CHUNK_SIZE)
+		encoding = _sniff_encoding(file_obj.peek(DOWNLOAD_CHUNK_SIZE), conn.remote_encoding)
+		if encoding in _ICONV_ENCODINGS and conn.has_command('iconv'):
+			# 中文编码交给远端 iconv 转为 UTF-8，本地只做字节转发；-c 跳过非法字节
+			file_obj.close()
+			try:
+				file_obj = conn.open_command_stream(f"iconv -c -f {_ICONV_ENCODINGS[encoding]} -t UTF-8 {shlex.quote(file_path)}", timeout=DOWNLOAD_READ_TIMEOUT)
+			except Exception as e:
+				return jsonify({'success': False,'error': {'code': 'INTERNAL','message': f'读取文件失败: {e}'}}), 500
+			# 转码后长度未知，不设置 Content-Length
+			file_size = None
+		else:
+			# 大文件启用 SFTP 预读：按有界窗口并发请求后续数据块，吞吐不再受单块往返延迟限制，内存占用也不随文件大小增长
+			try:
+				if file_size is not None and file_size >= DOWNLOAD_PREFETCH_MIN_BYTES:
+					remote_file.prefetch()
+			except Exception as e:
+				logger.debug(f"SFTP 预取未启用: {e}")
+			if encoding not in ('utf-8', 'utf8', 'ascii'):
+				# 远端无 iconv 或非中文编码：边读边在本地转码
+				file_obj = codecs.EncodedFile(file_obj, 'utf-8', encoding, errors='replace')
+				file_size = None
+		# 文件名以时间戳结尾，总是追加 .log 后缀
+		download_filename = f"{host}_{os.path.basename(file_path) or 'log'}_{time.strftime(_TS_FMT)}.log"
+		if _USE_DOWNLOAD_NAME:
+			response = send_file(file_obj, mimetype='text/plain', as_attachment=True, download_name=download_filename)
 		else:
-			from flask import Response
-			return Response(file_obj.getvalue(), mimetype='text/plain', headers={'Content-Disposition': f'attachment; filename="{download_filename}"'})
+			chunks = iter(lambda: file_obj.read(DOWNLOAD_CHUNK_SIZE), b'')
+			response = Response(chunks, mimetype='text/plain', headers={'Content-Disposition': f'attachment; filename="{download_filename}"'})
+			response.call_on_close(file_obj.close)
+		if file_size is not None:
+			# 原样转发时长度已知，便于客户端显示下载进度
+			response.content_length = file_size
+		return response
 	except Exception as e:
 		logger.error(f"下载文件失败: {e}")
-		from flask import jsonify
 		return jsonify({'success': False,'error': {'code': 'INTERNAL','message': f'下载文件失败: {e}'}}), 500
-	finally:
-		if 'ssh_manager' in locals():
-			ssh_manager.close_all()
 
 __all__ = ['logs_bp']
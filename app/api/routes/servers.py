@@ -7,12 +7,13 @@ so the SFTP UI can present available servers to connect.
 from __future__ import annotations
 
 from flask import Blueprint, request
-from app.services import ConfigService
-from app.config.system_settings import Settings
+from app.services import get_config_service
 from app.middleware import api_response
 
 servers_bp = Blueprint('servers', __name__)
-_config_service = ConfigService(Settings().CONFIG_FILE_PATH)
+_config_service = get_config_service()
+# (config version, aggregated payload); swapped as one tuple so readers never see a torn pair
+_servers_cache = (None, None)
 
 
 @servers_bp.route('/servers', methods=['GET'])
@@ -24,28 +25,19 @@ def list_servers():
       type: optional filter (currently only 'sftp' supported, ignored otherwise)
     """
     _ = request.args.get('type')  # placeholder for future filtering
-    logs = _config_service.get_logs()
-    # Aggregate by credential tuple
-    agg = {}
-    for log in logs:
-        sshs = getattr(log, 'sshs', []) or []
-        for idx, ssh in enumerate(sshs):
-            host = ssh.get('host'); port = ssh.get('port', 22); user = ssh.get('username')
-            if not host or not user:
-                continue
-            sid = f"{user}@{host}:{port}"
-            entry = agg.setdefault(sid, {
-                'server_id': sid,
-                'host': host,
-                'port': port,
-                'username': user,
-                # server_name can later be customized; keep host baseline
-                'server_name': host,
-                'log_configs': []
-            })
-            entry['log_configs'].append({'log_name': log.name, 'ssh_index': idx})
-    servers = list(agg.values())
-    servers.sort(key=lambda s: (s['host'], s['username'], s['port']))
-    return {'servers': servers, 'total': len(servers)}
+    global _servers_cache
+    version = _config_service.version()
+    cached_version, cached = _servers_cache
+    if version is not None and cached_version == version:
+        return cached
+    data = _aggregate_servers()
+    _servers_cache = (version, data)
+    return data
+
+
+def _aggregate_servers():
+    # The service dedupes servers once per config change; here we only sort and serialize
+    servers = sorted(_config_service.get_servers_index().values(), key=lambda s: (s.host, s.username, s.port))
+    return {'servers': [s.to_dict() for s in servers], 'total': len(servers)}
 
 __all__ = ['servers_bp']
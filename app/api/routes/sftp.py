@@ -15,210 +15,187 @@ Provides SFTP file management APIs:
 
 from __future__ import annotations
 
-import os
-import tempfile
 from flask import Blueprint, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 
-from app.services import SFTPService, ConfigService
-from app.config.system_settings import Settings
+from app.services import SFTPService, get_config_service
+from app.middleware import max_json_body, json_endpoint
 
 sftp_bp = Blueprint('sftp', __name__)
 _sftp_service = SFTPService()
+_config_service = get_config_service()
+
+BATCH_DOWNLOAD_MAX_BODY = 8 << 20   # 批量下载允许较大的路径列表
+BATCH_DOWNLOAD_MAX_PATHS = 1000     # 单次批量下载的路径数量上限
+
+# 各接口的必需字段（导入时确定，校验时按顺序报告第一个缺失字段）
+_CONNECT_FIELDS = ('host', 'username', 'password')
+_MKDIR_FIELDS = ('connection_id', 'remote_path', 'dir_name')
+_DELETE_FIELDS = ('connection_id', 'remote_path')
+
+
+def _missing_field_error(data, fields: tuple):
+	"""返回缺少必需字段时的错误响应；字段齐全时返回 None"""
+	missing = next((f for f in fields if f not in data), None) if isinstance(data, dict) else fields[0]
+	if missing is None:
+		return None
+	return jsonify({'success': False,'error': {'code':'MISSING_FIELD','message': f'缺少必需字段: {missing}'}}), 400
 
 
 @sftp_bp.route('/sftp/connect', methods=['POST'])
+@json_endpoint('SFTP连接失败', not_found=())
 def connect_sftp():
-	try:
-		data = request.get_json() or {}
-		for f in ('host','username','password'):
-			if f not in data:
-				return jsonify({'success': False,'error': {'code':'MISSING_FIELD','message': f'缺少必需字段: {f}'}}), 400
-		info = _sftp_service.connect(
-			host=data['host'],
-			port=data.get('port', 22),
-			username=data['username'],
-			password=data['password'],
-			connection_name=data.get('connection_name',''))
-		return jsonify({'success': True,'data': {
-			'connection_id': info.connection_id,
-			'host': info.host,
-			'port': info.port,
-			'username': info.username,
-			'connection_name': info.connection_name,
-			'message': f'成功连接到 {info.host}:{info.port}',
-			'connected_at': info.connected_at
-		}})
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'SFTP连接失败: {e}'}}), 500
+	data = request.get_json(silent=True) or {}
+	err = _missing_field_error(data, _CONNECT_FIELDS)
+	if err: return err
+	info = _sftp_service.connect(
+		host=data['host'],
+		port=data.get('port', 22),
+		username=data['username'],
+		password=data['password'],
+		connection_name=data.get('connection_name',''))
+	return {
+		'connection_id': info.connection_id,
+		'host': info.host,
+		'port': info.port,
+		'username': info.username,
+		'connection_name': info.connection_name,
+		'message': f'成功连接到 {info.host}:{info.port}',
+		'connected_at': info.connected_at
+	}
 
 
 @sftp_bp.route('/sftp/connect-by-config', methods=['POST'])
+@json_endpoint('通过配置连接失败', not_found=())
 def connect_sftp_by_config():
+	data = request.get_json(silent=True) or {}
+	log_name = data.get('log_name')
+	ssh_index = data.get('ssh_index')
+	if log_name is None or ssh_index is None:
+		return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'缺少必需字段: log_name 或 ssh_index'}}), 400
+	log_cfg = _config_service.get_log_by_name(log_name)
+	if not log_cfg:
+		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': f'未找到日志配置: {log_name}'}}), 404
+	sshs = log_cfg.sshs
 	try:
-		data = request.get_json() or {}
-		log_name = data.get('log_name')
-		ssh_index = data.get('ssh_index')
-		if log_name is None or ssh_index is None:
-			return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'缺少必需字段: log_name 或 ssh_index'}}), 400
-		cfg = ConfigService(Settings().CONFIG_FILE_PATH)
-		log_cfg = cfg.get_log_by_name(log_name)
-		if not log_cfg:
-			return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': f'未找到日志配置: {log_name}'}}), 404
-		sshs = getattr(log_cfg,'sshs',[]) or []
-		try:
-			ssh_index = int(ssh_index)
-		except Exception:
-			return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'ssh_index 必须是整数'}}), 400
-		if ssh_index < 0 or ssh_index >= len(sshs):
-			return jsonify({'success': False,'error': {'code':'INVALID_ARGUMENT','message':'ssh_index 超出范围'}}), 400
-		ssh = sshs[ssh_index]
-		if not ssh.get('password'):
-			return jsonify({'success': False,'error': {'code':'INVALID_CONFIG','message':'该SSH配置未提供密码，无法自动连接'}}), 400
-		info = _sftp_service.connect(
-			host=ssh.get('host'),
-			port=ssh.get('port',22),
-			username=ssh.get('username'),
-			password=ssh.get('password'),
-			connection_name=data.get('connection_name') or f"{log_cfg.name} - {ssh.get('host')}{'#'+str(ssh_index+1) if len(sshs)>1 else ''}"
-		)
-		return jsonify({'success': True,'data': {
-			'connection_id': info.connection_id,
-			'host': info.host,
-			'port': info.port,
-			'username': info.username,
-			'connection_name': info.connection_name,
-			'message': f'成功连接到 {info.host}:{info.port}',
-			'connected_at': info.connected_at
-		}})
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'通过配置连接失败: {e}'}}), 500
+		ssh_index = int(ssh_index)
+	except Exception:
+		return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'ssh_index 必须是整数'}}), 400
+	if ssh_index < 0 or ssh_index >= len(sshs):
+		return jsonify({'success': False,'error': {'code':'INVALID_ARGUMENT','message':'ssh_index 超出范围'}}), 400
+	ssh = sshs[ssh_index]
+	if not ssh.get('password'):
+		return jsonify({'success': False,'error': {'code':'INVALID_CONFIG','message':'该SSH配置未提供密码，无法自动连接'}}), 400
+	info = _sftp_service.connect(
+		host=ssh.get('host'),
+		port=ssh.get('port',22),
+		username=ssh.get('username'),
+		password=ssh.get('password'),
+		connection_name=data.get('connection_name') or f"{log_cfg.name} - {ssh.get('host')}{'#'+str(ssh_index+1) if len(sshs)>1 else ''}"
+	)
+	return {
+		'connection_id': info.connection_id,
+		'host': info.host,
+		'port': info.port,
+		'username': info.username,
+		'connection_name': info.connection_name,
+		'message': f'成功连接到 {info.host}:{info.port}',
+		'connected_at': info.connected_at
+	}
 
 
 @sftp_bp.route('/sftp/disconnect', methods=['POST'])
+@json_endpoint('断开连接失败')
 def disconnect_sftp():
-	try:
-		data = request.get_json() or {}
-		cid = data.get('connection_id')
-		if not cid:
-			return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'缺少connection_id字段'}}), 400
-		result = _sftp_service.disconnect(cid)
-		return jsonify({'success': True,'data': result})
-	except ValueError as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': str(e)}}), 404
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'断开连接失败: {e}'}}), 500
+	data = request.get_json(silent=True) or {}
+	cid = data.get('connection_id')
+	if not cid:
+		return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'缺少connection_id字段'}}), 400
+	return _sftp_service.disconnect(cid)
 
 
 @sftp_bp.route('/sftp/connections', methods=['GET'])
+@json_endpoint('获取连接列表失败', not_found=())
 def get_connections():
-	try:
-		data = _sftp_service.get_connections()
-		return jsonify({'success': True,'data': data})
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'获取连接列表失败: {e}'}}), 500
+	return _sftp_service.get_connections()
 
 
 @sftp_bp.route('/sftp/list', methods=['POST'])
+@max_json_body()
+@json_endpoint('列出目录失败')
 def list_directory():
-	try:
-		data = request.get_json() or {}
-		cid = data.get('connection_id')
-		if not cid:
-			return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'缺少connection_id字段'}}), 400
-		info = _sftp_service.list_directory(cid, data.get('path','.'))
-		return jsonify({'success': True,'data': info})
-	except ValueError as e:
-		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': str(e)}}), 404
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'列出目录失败: {e}'}}), 500
+	data = request.get_json(silent=True) or {}
+	cid = data.get('connection_id')
+	if not cid:
+		return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'缺少connection_id字段'}}), 400
+	return _sftp_service.list_directory(cid, data.get('path','.'))
 
 
 @sftp_bp.route('/sftp/download', methods=['GET', 'POST'])
+@json_endpoint('下载文件失败')
 def download_file():
-	try:
-		if request.method == 'POST':
-			data = request.get_json(silent=True) or {}
-			cid = data.get('connection_id'); remote = data.get('remote_path')
-		else:
-			cid = request.args.get('connection_id'); remote = request.args.get('remote_path')
-		if not cid or not remote:
-			return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'请提供connection_id和remote_path'}}), 400
-		temp_path, filename = _sftp_service.download_file(cid, remote)
-		return send_file(temp_path, as_attachment=True, download_name=filename, mimetype='application/octet-stream')
-	except ValueError as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': str(e)}}), 404
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'下载文件失败: {e}'}}), 500
+	if request.method == 'POST':
+		data = request.get_json(silent=True) or {}
+		cid = data.get('connection_id'); remote = data.get('remote_path')
+	else:
+		cid = request.args.get('connection_id'); remote = request.args.get('remote_path')
+	if not cid or not remote:
+		return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'请提供connection_id和remote_path'}}), 400
+	fp, filename, size = _sftp_service.open_remote(cid, remote)
+	# 直接流式转发远端文件，响应结束时由 werkzeug 关闭文件句柄
+	response = send_file(fp, as_attachment=True, download_name=filename, mimetype='application/octet-stream')
+	response.content_length = size
+	return response
 
 
 @sftp_bp.route('/sftp/batch-download', methods=['POST'])
+@max_json_body(BATCH_DOWNLOAD_MAX_BODY)
+@json_endpoint('批量下载失败')
 def batch_download():
-	try:
-		data = request.get_json() or {}
-		cid = data.get('connection_id'); paths = data.get('paths') or []
-		if not cid or not paths:
-			return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'缺少connection_id或paths字段'}}), 400
-		zip_path, zip_filename = _sftp_service.batch_download(cid, paths)
-		return send_file(zip_path, as_attachment=True, download_name=zip_filename, mimetype='application/zip')
-	except ValueError as e:
-		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': str(e)}}), 404
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'批量下载失败: {e}'}}), 500
+	data = request.get_json(silent=True) or {}
+	cid = data.get('connection_id'); paths = data.get('paths') or []
+	if not cid or not paths:
+		return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'缺少connection_id或paths字段'}}), 400
+	if len(paths) > BATCH_DOWNLOAD_MAX_PATHS:
+		return jsonify({'success': False,'error': {'code':'INVALID_ARGUMENT','message': f'一次最多下载 {BATCH_DOWNLOAD_MAX_PATHS} 个路径'}}), 400
+	zip_file, zip_filename, size = _sftp_service.batch_download(cid, paths)
+	response = send_file(zip_file, as_attachment=True, download_name=zip_filename, mimetype='application/zip')
+	response.content_length = size
+	return response
 
 
 @sftp_bp.route('/sftp/upload', methods=['POST'])
+@json_endpoint('上传文件失败')
 def upload_file():
-	try:
-		cid = request.form.get('connection_id'); remote_path = request.form.get('remote_path')
-		if not cid or not remote_path:
-			return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'请提供connection_id和remote_path'}}), 400
-		if 'file' not in request.files:
-			return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'没有选择文件'}}), 400
-		f = request.files['file']
-		if not f.filename:
-			return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'没有选择文件'}}), 400
-		filename = secure_filename(f.filename)
-		tmp = tempfile.NamedTemporaryFile(delete=False)
-		f.save(tmp.name); tmp.close()
-		try:
-			result = _sftp_service.upload_file(cid, tmp.name, remote_path, filename)
-			return jsonify({'success': True,'data': result})
-		finally:
-			try: os.unlink(tmp.name)  # noqa
-			except Exception: pass
-	except ValueError as e:
-		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': str(e)}}), 404
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'上传文件失败: {e}'}}), 500
+	cid = request.form.get('connection_id'); remote_path = request.form.get('remote_path')
+	if not cid or not remote_path:
+		return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'请提供connection_id和remote_path'}}), 400
+	if 'file' not in request.files:
+		return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'没有选择文件'}}), 400
+	f = request.files['file']
+	if not f.filename:
+		return jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'没有选择文件'}}), 400
+	filename = secure_filename(f.filename)
+	return _sftp_service.upload_stream(cid, f.stream, remote_path, filename)
 
 
 @sftp_bp.route('/sftp/mkdir', methods=['POST'])
+@max_json_body()
+@json_endpoint('创建目录失败')
 def create_directory():
-	try:
-		data = request.get_json() or {}
-		for f in ('connection_id','remote_path','dir_name'):
-			if f not in data:
-				return jsonify({'success': False,'error': {'code':'MISSING_FIELD','message': f'缺少必需字段: {f}'}}), 400
-		result = _sftp_service.create_directory(data['connection_id'], data['remote_path'], data['dir_name'])
-		return jsonify({'success': True,'data': result})
-	except ValueError as e:
-		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': str(e)}}), 404
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'创建目录失败: {e}'}}), 500
+	data = request.get_json(silent=True) or {}
+	err = _missing_field_error(data, _MKDIR_FIELDS)
+	if err: return err
+	return _sftp_service.create_directory(data['connection_id'], data['remote_path'], data['dir_name'])
 
 
 @sftp_bp.route('/sftp/delete', methods=['POST'])
+@max_json_body()
+@json_endpoint('删除失败')
 def delete_item():
-	try:
-		data = request.get_json() or {}
-		if 'connection_id' not in data or 'remote_path' not in data:
-			return jsonify({'success': False,'error': {'code':'MISSING_FIELD','message':'缺少必需字段: connection_id 或 remote_path'}}), 400
-		result = _sftp_service.delete_item(data['connection_id'], data['remote_path'], data.get('is_directory', False))
-		return jsonify({'success': True,'data': result})
-	except ValueError as e:
-		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': str(e)}}), 404
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'删除失败: {e}'}}), 500
+	data = request.get_json(silent=True) or {}
+	err = _missing_field_error(data, _DELETE_FIELDS)
+	if err: return err
+	return _sftp_service.delete_item(data['connection_id'], data['remote_path'], data.get('is_directory', False))
 
 __all__ = ['sftp_bp']
@@ -2,33 +2,40 @@
 
 from __future__ import annotations
 
+import re
+from functools import wraps
+from itertools import islice
 from flask import Blueprint, request, jsonify
 from app.services.terminal import TerminalService  # direct service if needed
 from app.services.terminal.manager import terminal_service  # singleton
-from app.services import ConfigService
-from app.config.system_settings import Settings
+from app.services import get_config_service
+from app.middleware import max_json_body, json_endpoint
 
 terminals_bp = Blueprint('terminals', __name__)
+_config_service = get_config_service()
+# server_id 形如 user@host:port（与 /servers 接口生成的格式一致）
+_SERVER_ID_RE = re.compile(r'^([^@]+)@(.+):(\d+)$')
+
+
+def _json_once(view):
+	"""解析一次 JSON 请求体并作为第一个参数传给视图；非对象/空/非法请求体按 {} 处理
+
+	get_json 默认 cache=True，解析结果缓存在 request 上，后续再读不会重复解析。
+	"""
+	@wraps(view)
+	def wrapper(*args, **kwargs):
+		data = request.get_json(silent=True, cache=True)
+		return view(data if isinstance(data, dict) else {}, *args, **kwargs)
+	return wrapper
 
 
 def _create_from_server_id(server_id: str, data: dict):
-	if '@' not in server_id or ':' not in server_id:
+	m = _SERVER_ID_RE.match(server_id)
+	if not m:
 		return None, (jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'无效的服务器ID'}}), 400)
-	try:
-		user_host, port_s = server_id.rsplit(':',1)
-		username, host = user_host.split('@',1)
-		port = int(port_s)
-	except Exception:
-		return None, (jsonify({'success': False,'error': {'code':'INVALID_REQUEST','message':'无效的服务器ID'}}), 400)
-	cfg = ConfigService(Settings().CONFIG_FILE_PATH)
-	password = None
-	for item in cfg.get_log_summary():  # summary names
-		log_cfg = cfg.get_log_by_name(item['name'])
-		if not log_cfg: continue
-		for ssh in getattr(log_cfg,'sshs',[]) or []:
-			if ssh.get('host')==host and ssh.get('port',22)==port and ssh.get('username')==username:
-				password = ssh.get('password'); break
-		if password: break
+	username, host, port = m.group(1), m.group(2), int(m.group(3))
+	# 端点索引直接定位同一服务器的全部 ssh 配置，取第一个带密码的
+	password = next((ssh['password'] for ssh in _config_service.get_endpoint_sshs(host, port, username) if ssh.get('password')), None)
 	if not password:
 		return None, (jsonify({'success': False,'error': {'code':'INVALID_CONFIG','message': f'未找到服务器 {server_id} 的密码配置'}}), 400)
 	session = terminal_service.create_terminal(host=host, port=port, username=username, password=password, private_key='', initial_command=data.get('initial_command',''), env_init=bool(data.get('env_init', True)))
@@ -43,11 +50,10 @@ def _create_from_server_id(server_id: str, data: dict):
 
 
 def _create_from_log_config(log_name, ssh_index, data):
-	cfg = ConfigService(Settings().CONFIG_FILE_PATH)
-	log_cfg = cfg.get_log_by_name(log_name)
+	log_cfg = _config_service.get_log_by_name(log_name)
 	if not log_cfg:
 		return None, (jsonify({'success': False,'error': {'code':'NOT_FOUND','message': f'未找到日志配置: {log_name}'}}), 404)
-	sshs = getattr(log_cfg,'sshs',[]) or []
+	sshs = log_cfg.sshs
 	try:
 		ssh_index = int(ssh_index)
 	except Exception:
@@ -79,137 +85,109 @@ def _create_from_config(data):
 
 
 @terminals_bp.route('/terminals', methods=['POST'])
-def create_terminal():
-	try:
-		data = request.get_json() or {}
-		resp, err = _create_from_config(data)
-		if err: return err
-		return jsonify({'success': True,'data': resp})
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'创建终端会话失败: {e}'}}), 500
-
-
 @terminals_bp.route('/terminals/connect-by-config', methods=['POST'])
-def create_terminal_by_config():
-	try:
-		data = request.get_json() or {}
-		resp, err = _create_from_config(data)
-		if err: return err
-		return jsonify({'success': True,'data': resp})
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'创建终端会话失败: {e}'}}), 500
+@max_json_body()
+@json_endpoint('创建终端会话失败', not_found=())
+@_json_once
+def create_terminal(data):
+	resp, err = _create_from_config(data)
+	if err: return err
+	return resp
 
 
 @terminals_bp.route('/terminals', methods=['GET'])
+@json_endpoint('获取终端列表失败', not_found=())
 def get_terminals():
-	try:
-		return jsonify({'success': True,'data': terminal_service.get_terminals()})
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'获取终端列表失败: {e}'}}), 500
+	return terminal_service.get_terminals()
 
 
 @terminals_bp.route('/terminals/<terminal_id>', methods=['GET'])
+@json_endpoint('获取终端信息失败', not_found=())
 def get_terminal(terminal_id):
-	try:
-		s = terminal_service.get_terminal(terminal_id)
-		if not s:
-			return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': f'终端会话不存在: {terminal_id}'}}), 404
-		return jsonify({'success': True,'data': {
-			'terminal_id': s.terminal_id,
-			'session_id': s.session_id,
-			'host': s.host,
-			'port': s.port,
-			'username': s.username,
-			'status': s.status,
-			'created_at': s.created_at,
-			'last_activity': s.last_activity,
-			'current_directory': s.current_directory,
-			'current_prompt': f'{s.username}@{s.host}:{s.current_directory}$ ',
-				'session_history': (s.session_history or [])[-10:],
-				'encodings': {
-					'last_detected': terminal_service.sessions.get(terminal_id, {}).get('encoding'),
-					'forced': terminal_service.sessions.get(terminal_id, {}).get('forced_encoding'),
-				},
-				'env_init': terminal_service.sessions.get(terminal_id, {}).get('env_init', False),
-				'locale': terminal_service.sessions.get(terminal_id, {}).get('last_locale')
-		}})
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'获取终端信息失败: {e}'}}), 500
+	s = terminal_service.get_terminal(terminal_id)
+	if not s:
+		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': f'终端会话不存在: {terminal_id}'}}), 404
+	return {
+		'terminal_id': s.terminal_id,
+		'session_id': s.session_id,
+		'host': s.host,
+		'port': s.port,
+		'username': s.username,
+		'status': s.status,
+		'created_at': s.created_at,
+		'last_activity': s.last_activity,
+		'current_directory': s.current_directory,
+		'current_prompt': f'{s.username}@{s.host}:{s.current_directory}$ ',
+		'session_history': list(islice(s.session_history, max(0, len(s.session_history) - 10), None)),
+		'encodings': {
+			'last_detected': terminal_service.sessions.get(terminal_id, {}).get('encoding'),
+			'forced': terminal_service.sessions.get(terminal_id, {}).get('forced_encoding'),
+		},
+		'env_init': terminal_service.sessions.get(terminal_id, {}).get('env_init', False),
+		'locale': terminal_service.sessions.get(terminal_id, {}).get('last_locale')
+	}
 
 
 @terminals_bp.route('/terminals/<terminal_id>', methods=['DELETE'])
+@json_endpoint('关闭终端会话失败')
 def delete_terminal(terminal_id):
-	try:
-		result = terminal_service.close_terminal(terminal_id)
-		return jsonify({'success': True,'data': result})
-	except ValueError as e:
-		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': str(e)}}), 404
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'关闭终端会话失败: {e}'}}), 500
+	return terminal_service.close_terminal(terminal_id)
 
 
 @terminals_bp.route('/terminals/<terminal_id>/encoding', methods=['POST'])
-def set_terminal_encoding(terminal_id):
+@max_json_body()
+@json_endpoint('设置编码失败', not_found=())
+@_json_once
+def set_terminal_encoding(data, terminal_id):
 	"""Set or clear a forced encoding for a terminal session.
 
 	Request JSON: {"encoding": "gb18030"} or {"encoding": null} to clear.
 	"""
-	try:
-		data = request.get_json() or {}
-		enc = data.get('encoding')
-		with terminal_service._lock:  # internal lock for thread safety
-			sd = terminal_service.sessions.get(terminal_id)
-			if not sd:
-				return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': '终端会话不存在'}}), 404
-			if enc:
-				# basic whitelist to avoid arbitrary injection
-				allowed = {'utf-8','gb18030','gbk','big5','shift_jis','latin-1'}
-				if enc.lower() not in allowed:
-					return jsonify({'success': False,'error': {'code':'INVALID_ARGUMENT','message': f'不支持的编码: {enc}'}}), 400
-				sd['forced_encoding'] = enc.lower()
-			else:
-				sd['forced_encoding'] = None
-		return jsonify({'success': True,'data': {'terminal_id': terminal_id,'forced_encoding': sd.get('forced_encoding')}})
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'设置编码失败: {e}'}}), 500
+	enc = data.get('encoding')
+	with terminal_service._lock:  # internal lock for thread safety
+		sd = terminal_service.sessions.get(terminal_id)
+		if not sd:
+			return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': '终端会话不存在'}}), 404
+		if enc:
+			# basic whitelist to avoid arbitrary injection
+			allowed = {'utf-8','gb18030','gbk','big5','shift_jis','latin-1'}
+			if enc.lower() not in allowed:
+				return jsonify({'success': False,'error': {'code':'INVALID_ARGUMENT','message': f'不支持的编码: {enc}'}}), 400
+			sd['forced_encoding'] = enc.lower()
+		else:
+			sd['forced_encoding'] = None
+	return {'terminal_id': terminal_id,'forced_encoding': sd.get('forced_encoding')}
 
 
 @terminals_bp.route('/terminals/<terminal_id>/size', methods=['POST'])
-def resize_terminal(terminal_id):
+@max_json_body()
+@json_endpoint('调整终端大小失败')
+@_json_once
+def resize_terminal(data, terminal_id):
 	"""Resize PTY for better wrapping.
 
 	Request JSON: {"cols": <int>, "rows": <int>}.
 	"""
-	try:
-		data = request.get_json() or {}
-		cols = int(data.get('cols',0)); rows = int(data.get('rows',0))
-		if cols <=0 or rows <=0:
-			return jsonify({'success': False,'error': {'code':'INVALID_ARGUMENT','message': 'cols/rows 必须为正整数'}}), 400
-		terminal_service.resize_terminal(terminal_id, cols, rows)
-		return jsonify({'success': True,'data': {'terminal_id': terminal_id,'cols': cols,'rows': rows}})
-	except ValueError as e:
-		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': str(e)}}), 404
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'调整终端大小失败: {e}'}}), 500
+	cols = int(data.get('cols',0)); rows = int(data.get('rows',0))
+	if cols <=0 or rows <=0:
+		return jsonify({'success': False,'error': {'code':'INVALID_ARGUMENT','message': 'cols/rows 必须为正整数'}}), 400
+	terminal_service.resize_terminal(terminal_id, cols, rows)
+	return {'terminal_id': terminal_id,'cols': cols,'rows': rows}
 
 
 @terminals_bp.route('/terminals/<terminal_id>/locale', methods=['POST'])
-def set_terminal_locale(terminal_id):
+@max_json_body()
+@json_endpoint('设置 locale 失败')
+@_json_once
+def set_terminal_locale(data, terminal_id):
 	"""Set or auto-detect a UTF-8 locale for the remote session.
 
 	Request JSON examples:
 	{"locale": "en_US.UTF-8"}
 	{"auto": true}
 	"""
-	try:
-		data = request.get_json() or {}
-		locale = data.get('locale')
-		auto = bool(data.get('auto'))
-		result = terminal_service.set_locale(terminal_id, locale=locale, auto=auto)
-		return jsonify({'success': True,'data': result})
-	except ValueError as e:
-		return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': str(e)}}), 404
-	except Exception as e:  # noqa
-		return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'设置 locale 失败: {e}'}}), 500
+	locale = data.get('locale')
+	auto = bool(data.get('auto'))
+	return terminal_service.set_locale(terminal_id, locale=locale, auto=auto)
 
 __all__ = ['terminals_bp']
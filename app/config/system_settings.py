@@ -1,5 +1,6 @@
 """应用配置 - 统一的配置参数管理"""
 import os
+import logging
 import configparser
 from dataclasses import dataclass
 from pathlib import Path
@@ -8,7 +9,6 @@ from pathlib import Path
 def _get_config_file() -> str:
     """获取配置文件路径（环境变量 > 可执行文件目录 > 当前目录）"""
     import sys
-    import logging
     
     logger = logging.getLogger(__name__)
     
@@ -65,7 +65,6 @@ def _get_config_file() -> str:
 
 def _load_config() -> configparser.ConfigParser:
     """加载外部配置文件"""
-    import logging
     logger = logging.getLogger(__name__)
     
     config = configparser.ConfigParser()
@@ -190,6 +189,10 @@ class Settings:
     # ===== 搜索配置 =====
     MAX_SEARCH_RESULTS: int = _get_int("MAX_SEARCH_RESULTS", 10000, "search", "max_search_results")
     SEARCH_TIMEOUT: int = _get_int("SEARCH_TIMEOUT", 30, "search", "search_timeout")
+    SEARCH_MAX_WORKERS: int = _get_int("LOG_SEARCH_THREADS", 64, "search", "search_max_workers")
+    
+    # ===== 下载配置 =====
+    MAX_DOWNLOAD_BYTES: int = _get_int("MAX_DOWNLOAD_BYTES", 512 * 1024 * 1024, "download", "max_download_bytes")
     
     # ===== 终端配置 =====
     TERMINAL_IDLE_TIMEOUT: int = _get_int("TERMINAL_IDLE_TIMEOUT", 1800, "terminal", "terminal_idle_timeout")
@@ -5,10 +5,62 @@ from __future__ import annotations
 import time
 import logging
 from functools import wraps
-from flask import Flask, request, jsonify, g
+from flask import Flask, current_app, request, jsonify, g
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:  # 可选依赖：安装 orjson 时作为全局 JSON provider，否则使用 Flask 自带 json
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - optional dependency
+    _orjson = None
 
 logger = logging.getLogger(__name__)
 
+
+class ORJSONProvider(JSONProvider):
+    """orjson 实现的 Flask JSON provider：request.get_json / jsonify 都经由它完成解析和序列化
+
+    键排序和无法原生序列化对象（日期、Decimal 等）的处理与 Flask 默认 provider 保持一致。
+    """
+
+    option = 0 if _orjson is None else (_orjson.OPT_NON_STR_KEYS | _orjson.OPT_SORT_KEYS | _orjson.OPT_PASSTHROUGH_DATETIME)
+
+    def __init__(self, app):
+        super().__init__(app)
+        # orjson 无法表达的参数（indent 非 2、ensure_ascii=True、cls 等）交给 Flask 默认实现，避免静默忽略
+        self._fallback = DefaultJSONProvider(app)
+
+    def dumps(self, obj, **kwargs) -> str:
+        option = self.option
+        default = kwargs.pop('default', DefaultJSONProvider.default)
+        if not kwargs.pop('sort_keys', True):
+            option &= ~_orjson.OPT_SORT_KEYS
+        if kwargs.get('indent') == 2:
+            kwargs.pop('indent')
+            option |= _orjson.OPT_INDENT_2
+        if kwargs.get('ensure_ascii') is False:
+            kwargs.pop('ensure_ascii')  # orjson 本就输出未转义的 UTF-8
+        if kwargs:
+            if option & _orjson.OPT_INDENT_2:
+                kwargs['indent'] = 2
+            return self._fallback.dumps(obj, default=default, sort_keys=bool(option & _orjson.OPT_SORT_KEYS), **kwargs)
+        return _orjson.dumps(obj, default=default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return self._fallback.loads(s, **kwargs)
+        return _orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = _orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.option)
+        return self._app.response_class(body, mimetype='application/json')
+
+
+def configure_json(app: Flask):
+    if _orjson is not None:
+        app.json = ORJSONProvider(app)
+
+
 def setup_middleware(app: Flask):
     @app.before_request
     def before_request():
@@ -54,6 +106,39 @@ def api_response(func):
             return jsonify({'success': False,'error': {'code': 'INTERNAL','message': '服务器内部错误，请稍后重试','details': str(e)}}), 500
     return wrapper
 
+def max_json_body(limit: int = 1 << 20):
+    """在解析 JSON 之前按 Content-Length 拒绝超过 limit 字节的请求体（413）"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            length = request.content_length
+            if length is not None and length > limit:
+                return jsonify({'success': False,'error': {'code': 'PAYLOAD_TOO_LARGE','message': f'请求体过大（{length} 字节），上限 {limit} 字节'}}), 413
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def json_endpoint(error_message: str, not_found: tuple = (ValueError,)):
+    """把处理函数返回的数据包装成 {'success': True, 'data': ...}，并统一异常到错误响应
+
+    - 处理函数返回 Response 或 (body, status) 元组时原样透传（文件下载、参数校验错误等）
+    - not_found 中的异常映射为 404 NOT_FOUND，其余异常映射为 500 INTERNAL（消息以 error_message 开头）
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                result = func(*args, **kwargs)
+            except not_found as e:
+                return jsonify({'success': False,'error': {'code':'NOT_FOUND','message': str(e)}}), 404
+            except Exception as e:  # noqa
+                return jsonify({'success': False,'error': {'code':'INTERNAL','message': f'{error_message}: {e}'}}), 500
+            if isinstance(result, (tuple, current_app.response_class)):
+                return result
+            return jsonify({'success': True,'data': result})
+        return wrapper
+    return decorator
+
 def register_error_handlers(app: Flask):
     @app.errorhandler(404)
     def not_found(error):
@@ -65,4 +150,4 @@ def register_error_handlers(app: Flask):
     def internal_error(error):
         return jsonify({'success': False,'error': {'code': 'INTERNAL','message': '服务器内部错误'}}), 500
 
-__all__ = ['setup_middleware','api_response','register_error_handlers']
+__all__ = ['setup_middleware','api_response','register_error_handlers','configure_json','ORJSONProvider','max_json_body','json_endpoint']
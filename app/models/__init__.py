@@ -1,6 +1,8 @@
 """Application data models (migrated)."""
 
+import shlex
 from dataclasses import dataclass, field
+from functools import cached_property
 from typing import List, Dict, Any, Optional
 
 
@@ -30,9 +32,9 @@ class LogConfig:
         return cls(
             name=data['name'],
             path=data.get('path'),
-            description=data.get('description', ''),
+            description=data.get('description') or '',
             group=data.get('group'),
-            sshs=data.get('sshs', [])
+            sshs=data.get('sshs') or []
         )
 
 
@@ -48,6 +50,11 @@ class SearchParams:
     selected_files: Optional[Dict[str, str]] = None
     max_lines: Optional[int] = None  # 每个主机返回的最大行数（截断前）
 
+    @cached_property
+    def escaped_keyword(self) -> str:
+        """shell 转义后的关键字；多主机搜索共用同一参数对象，只转义一次"""
+        return shlex.quote(self.keyword) if self.keyword else ''
+
     def validate(self):
         errors = []
         if self.context_span < 0 or self.context_span > 50:
@@ -151,7 +158,27 @@ class FileInfo:
             'host': self.host
         }
 
+@dataclass(slots=True)
+class ServerAgg:
+    """按 user@host:port 聚合的服务器条目（/servers 接口）"""
+    server_id: str
+    host: str
+    port: int
+    username: str
+    server_name: str
+    log_configs: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'server_id': self.server_id,
+            'host': self.host,
+            'port': self.port,
+            'username': self.username,
+            'server_name': self.server_name,
+            'log_configs': self.log_configs
+        }
+
 __all__ = [
     'LogConfig', 'SearchParams', 'SearchResult', 'MultiHostSearchResult',
-    'HostResult', 'FileInfo'
+    'HostResult', 'FileInfo', 'ServerAgg'
 ]
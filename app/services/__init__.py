@@ -4,23 +4,48 @@ During migration we re-export legacy implementations through placeholder
 modules so external imports continue to work. Once migration completes,
 the legacy `services/*.py` files can be removed and placeholders replaced
 with native code inside each subpackage.
+
+Exports are resolved lazily (PEP 562): importing one service no longer drags
+in paramiko / PyYAML for the others.
 """
 
+from importlib import import_module
+
 # 不再导出编码函数
-from .log import LogSearchService  # noqa: F401
-from .ssh import SSHConnectionManager  # noqa: F401
-from .terminal import TerminalService  # noqa: F401
-from .sftp import SFTPService  # noqa: F401
-from .config import ConfigService  # noqa: F401
+# 导出名 -> 所在子模块；首次访问时才导入
+_LAZY_EXPORTS = {
+    'LogSearchService': '.log',
+    'get_search_service': '.log',
+    'SSHConnectionManager': '.ssh',
+    'TerminalService': '.terminal',
+    'SFTPService': '.sftp',
+    'ConfigService': '.config',
+    'get_config_service': '.config',
+}
+
+
+def __getattr__(name):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
+
 
 __all__ = [
     'LogSearchService',
+    'get_search_service',
     'SSHConnectionManager',
     'TerminalService',
     'SFTPService',
     'ConfigService',
+    'get_config_service',
     'EsbService',
     'SERVICE',
     'get_esb'
 ]
-
@@ -1,5 +1,5 @@
 """Configuration management services."""
 
-from .service import ConfigService  # noqa: F401
+from .service import ConfigService, get_config_service  # noqa: F401
 
-__all__ = ['ConfigService']
+__all__ = ['ConfigService', 'get_config_service']
@@ -1,18 +1,54 @@
 """YAML configuration management service (migrated)."""
 
 import os
-import yaml
+import copy
+from functools import cache
 import logging
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, NamedTuple, Optional, Any
 from datetime import datetime
-from app.models import LogConfig
+from app.models import LogConfig, ServerAgg
 
 logger = logging.getLogger(__name__)
 
 
+@cache
+def _yaml() -> tuple:
+	"""首次真正需要解析/写入 YAML 时才导入 PyYAML（只访问缓存或从不读配置的进程无需加载它）
+
+	返回 (yaml 模块, Loader, Dumper)，优先使用 libyaml 的 C 实现。
+	"""
+	import yaml
+	try:
+		return yaml, yaml.CSafeLoader, yaml.CSafeDumper
+	except AttributeError:  # pragma: no cover - PyYAML built without libyaml
+		logger.warning("PyYAML 未启用 libyaml C 扩展，配置解析将使用纯 Python 实现（可安装 libyaml-dev 后重装 PyYAML）")
+		return yaml, yaml.SafeLoader, yaml.SafeDumper
+
+# 按配置文件路径缓存解析结果：{path: ((mtime_ns, size), config)}，进程内所有 ConfigService 实例共享
+_PARSE_CACHE: Dict[str, tuple] = {}
+
+# 保存配置时校验的必需字段（按顺序报告第一个缺失字段）
+_LOG_REQUIRED_FIELDS = ('name',)
+_SSH_REQUIRED_FIELDS = ('host', 'port', 'username')
+
+
+class _ConfigIndexes(NamedTuple):
+	"""一次遍历日志配置构建的索引，随 get_all_logs 的解析结果一起失效"""
+	logs: List[LogConfig]                         # 构建索引所用的日志列表（按 is 判断是否过期）
+	servers: Dict[str, ServerAgg]                 # user@host:port -> 去重后的服务器
+	endpoints: Dict[tuple, List[Dict[str, Any]]]  # (host, port, username) -> ssh 配置列表
+	names: Dict[str, List[LogConfig]]             # 日志名 -> 同名日志（按配置文件顺序）
+
+
 class ConfigService:
 	def __init__(self, config_path: str):
 		self.config_path = config_path
+		# ((mtime_ns, size), [LogConfig]) — 配置文件未变化时复用已解析的日志配置
+		self._logs_cache: Optional[tuple] = None
+		# 服务器、端点与名称索引 — 随 get_all_logs 的解析结果一起失效
+		self._servers_index: Optional[_ConfigIndexes] = None
+		# (logs 列表, summary) — 摘要同样只在解析结果变化时重建
+		self._summary_cache: Optional[tuple] = None
 		self._ensure_config_exists()
 
 	def _ensure_config_exists(self):
@@ -20,6 +56,11 @@ class ConfigService:
 		os.makedirs(cfg_dir, exist_ok=True)
 		if not os.path.exists(self.config_path):
 			self._create_default_config()
+		# 旧版本会在配置旁写一份含明文密码的 JSON 解析缓存，现已不再使用，存在则删除
+		try:
+			os.remove(f"{self.config_path}.cache.json")
+		except OSError:
+			pass
 
 	def _create_default_config(self):
 		default = {
@@ -33,22 +74,74 @@ class ConfigService:
 		self.save_config(default)
 		logger.info(f"创建默认配置文件: {self.config_path}")
 
+	def _stat_key(self) -> Optional[tuple]:
+		"""配置文件的缓存键 (mtime_ns, size)；所有按文件变化失效的缓存都用它，文件不存在时为 None"""
+		try:
+			st = os.stat(self.config_path)
+		except OSError:
+			return None
+		return (st.st_mtime_ns, st.st_size)
+
 	def load_config(self) -> Dict[str, Any]:
+		"""读取配置；文件 (mtime, size) 未变化时直接返回缓存的解析结果（调用方共享，需视为只读）"""
+		key = self._stat_key()
+		cached = _PARSE_CACHE.get(self.config_path)
+		if key is not None and cached is not None and cached[0] == key:
+			return cached[1]
 		try:
 			with open(self.config_path, 'r', encoding='utf-8') as f:
-				return yaml.safe_load(f) or {}
+				yaml, loader, _ = _yaml()
+				config = yaml.load(f, Loader=loader) or {}
 		except Exception as e:  # pragma: no cover - disk error
 			logger.error(f"加载配置失败: {e}")
 			return {'logs': [], 'settings': {}}
+		if key is not None:
+			_PARSE_CACHE[self.config_path] = (key, config)
+		return config
 
 	def save_config(self, config: Dict[str, Any]):
 		self._validate_config(config)
-		if os.path.exists(self.config_path):
-			self._backup_config()
-		with open(self.config_path, 'w', encoding='utf-8') as f:
-			yaml.dump(config, f, default_flow_style=False, allow_unicode=True)
+		yaml, _, dumper = _yaml()
+		data = yaml.dump(config, Dumper=dumper, default_flow_style=False, allow_unicode=True).encode('utf-8')
+		try:
+			with open(self.config_path, 'rb') as f:
+				current = f.read()
+		except OSError:
+			current = None
+		if current == data:
+			# 内容未变化（如界面重复提交）：不备份也不重写文件
+			logger.info("配置内容未变化，跳过保存")
+		else:
+			if current is not None:
+				self._backup_config()
+			self._write_atomic(data)
+		# 写穿缓存：刚写入的内容就是下一次 load_config 的结果，无需再解析一遍
+		# 缓存深拷贝：config 属于调用方，之后对它的修改不能影响缓存
+		key = self._stat_key()
+		if key is not None:
+			_PARSE_CACHE[self.config_path] = (key, copy.deepcopy(config))
 		logger.info("配置保存成功")
 
+	def _write_atomic(self, data: bytes):
+		"""先写临时文件再 os.replace，中途崩溃不会留下半截配置；沿用原文件权限（其中含密码）"""
+		tmp = f"{self.config_path}.tmp"
+		try:
+			with open(tmp, 'wb') as f:
+				f.write(data)
+				f.flush()
+				os.fsync(f.fileno())
+			try:
+				os.chmod(tmp, os.stat(self.config_path).st_mode & 0o7777)
+			except OSError:
+				pass
+			os.replace(tmp, self.config_path)
+		except BaseException:
+			try:
+				os.remove(tmp)
+			except OSError:
+				pass
+			raise
+
 	def _validate_config(self, config: Dict[str, Any]):
 		if not isinstance(config, dict):
 			raise ValueError("配置必须是字典格式")
@@ -59,18 +152,18 @@ class ConfigService:
 			if not isinstance(log, dict):
 				raise ValueError(f"logs[{i}] 必须是字典")
 			# 顶层 path 不再强制；但保留兼容（如果存在则允许）
-			for field in ['name']:
-				if field not in log:
-					raise ValueError(f"logs[{i}] 缺少必需字段: {field}")
+			missing = next((f for f in _LOG_REQUIRED_FIELDS if f not in log), None)
+			if missing:
+				raise ValueError(f"logs[{i}] 缺少必需字段: {missing}")
 			sshs = log.get('sshs', [])
 			if not isinstance(sshs, list):
 				raise ValueError(f"logs[{i}].sshs 必须是列表")
 			for j, ssh in enumerate(sshs):
 				if not isinstance(ssh, dict):
 					raise ValueError(f"logs[{i}].sshs[{j}] 必须是字典")
-				for field in ['host', 'port', 'username']:
-					if field not in ssh:
-						raise ValueError(f"logs[{i}].sshs[{j}] 缺少必需字段: {field}")
+				missing = next((f for f in _SSH_REQUIRED_FIELDS if f not in ssh), None)
+				if missing:
+					raise ValueError(f"logs[{i}].sshs[{j}] 缺少必需字段: {missing}")
 				# 新要求：每个 ssh 项必须包含 path
 				if 'path' not in ssh and 'path' not in log:
 					raise ValueError(f"logs[{i}].sshs[{j}] 缺少必需字段: path（请将路径移动到对应的ssh配置中）")
@@ -97,21 +190,78 @@ class ConfigService:
 				logger.warning(f"解析日志配置失败: {e}")
 		return out
 
+	def version(self) -> Optional[tuple]:
+		"""配置版本标识（文件 (mtime_ns, size)），调用方可据此缓存派生数据；文件不存在时为 None"""
+		return self._stat_key()
+
+	def get_all_logs(self) -> List[LogConfig]:
+		"""Return parsed log configs, reparsing only when the file (mtime, size) changes.
+
+		The returned objects are shared between callers and must be treated as read-only.
+		"""
+		key = self._stat_key()
+		cached = self._logs_cache
+		if key is not None and cached is not None and cached[0] == key:
+			return cached[1]
+		logs = self.get_logs()
+		self._logs_cache = (key, logs)
+		return logs
+
 	def get_log_by_name(self, name: str, group: Optional[str] = None) -> Optional[LogConfig]:
-		for log in self.get_logs():
-			if log.name == name and (group is None or log.group == group):
+		"""按名称查找日志配置（名称索引，O(1)）；返回对象与其他调用方共享，需视为只读"""
+		for log in self._get_indexes().names.get(name, ()):
+			if group is None or log.group == group:
 				return log
 		return None
 
+	def _get_indexes(self) -> _ConfigIndexes:
+		"""一次遍历构建服务器、端点与名称索引，随 get_all_logs 的解析结果一起失效"""
+		logs = self.get_all_logs()
+		cached = self._servers_index
+		if cached is not None and cached.logs is logs:
+			return cached
+		servers: Dict[str, ServerAgg] = {}
+		endpoints: Dict[tuple, List[Dict[str, Any]]] = {}
+		names: Dict[str, List[LogConfig]] = {}
+		for log in logs:
+			# 同名日志可能分属不同 group，按配置文件顺序保留
+			names.setdefault(log.name, []).append(log)
+			for idx, ssh in enumerate(log.sshs):
+				host = ssh.get('host'); port = ssh.get('port', 22); user = ssh.get('username')
+				endpoints.setdefault((host, port, user), []).append(ssh)
+				if not host or not user:
+					continue
+				sid = f"{user}@{host}:{port}"
+				entry = servers.get(sid)
+				if entry is None:
+					# server_name 以后可自定义，目前与 host 相同
+					entry = servers[sid] = ServerAgg(server_id=sid, host=host, port=port, username=user, server_name=host)
+				entry.log_configs.append({'log_name': log.name, 'ssh_index': idx})
+		cached = self._servers_index = _ConfigIndexes(logs, servers, endpoints, names)
+		return cached
+
+	def get_servers_index(self) -> Dict[str, ServerAgg]:
+		"""按 user@host:port 去重后的服务器索引，每次配置变化只构建一次；结果需视为只读"""
+		return self._get_indexes().servers
+
+	def get_endpoint_sshs(self, host: str, port: int, username: str) -> List[Dict[str, Any]]:
+		"""返回指向同一 (host, port, username) 的全部 ssh 配置（按配置文件顺序，只读）"""
+		return self._get_indexes().endpoints.get((host, port, username), [])
+
 	def get_log_by_unique_key(self, name: str, group: Optional[str] = None, path: Optional[str] = None) -> Optional[LogConfig]:
-		for log in self.get_logs():
+		for log in self.get_all_logs():
 			if log.name == name and log.group == group and (path is None or log.path == path):
 				return log
 		return None
 
 	def get_log_summary(self) -> List[Dict[str, Any]]:
+		"""日志摘要列表，每次配置变化只构建一次；结果与其他调用方共享，需视为只读"""
+		logs = self.get_all_logs()
+		cached = self._summary_cache
+		if cached is not None and cached[0] is logs:
+			return cached[1]
 		summary = []
-		for log in self.get_logs():
+		for log in logs:
 			# 为兼容旧数据，summary 中的 path 如果顶层没有，则展示第一个 ssh 的 path
 			first_path = None
 			for ssh in (log.sshs or []):
@@ -125,6 +275,7 @@ class ConfigService:
 				'description': log.description,
 				'group': log.group
 			})
+		self._summary_cache = (logs, summary)
 		return summary
 
 	def get_log_detail(self, name: str) -> Optional[Dict[str, Any]]:
@@ -146,4 +297,10 @@ class ConfigService:
 			'ssh_count': len(ssh_configs)
 		}
 
-__all__ = ['ConfigService']
+@cache
+def get_config_service() -> ConfigService:
+	"""进程内共享的 ConfigService（首次调用时按 Settings 中的路径创建），各路由共用同一份缓存"""
+	from app.config.system_settings import Settings
+	return ConfigService(Settings().CONFIG_FILE_PATH)
+
+__all__ = ['ConfigService', 'get_config_service']
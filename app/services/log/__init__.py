@@ -1,5 +1,5 @@
 """Log related services package."""
 
-from .search import LogSearchService  # noqa: F401
+from .search import LogSearchService, get_search_service  # noqa: F401
 
-__all__ = ['LogSearchService']
+__all__ = ['LogSearchService', 'get_search_service']
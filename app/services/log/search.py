@@ -12,12 +12,13 @@ import logging
 import time
 import re
 import shlex
+from functools import cache, lru_cache
 from typing import Dict, Any, List, Tuple, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from app.models import SearchParams, SearchResult, MultiHostSearchResult
 from app.services.ssh import SSHConnectionManager
-from app.services.utils.filename_resolver import resolve_log_filename
-from app.services.utils.encoding import EncodingDetector, smart_decode
+from app.services.utils.filename_resolver import has_placeholders, resolve_log_filename
+from app.services.utils.encoding import EncodingDetector, smart_decode, safe_decode
 from app.config.system_settings import Settings
 
 logger = logging.getLogger(__name__)
@@ -27,51 +28,92 @@ SINGLE_HOST_TAIL_RECENT = 100   # default recent lines when no keyword
 MIN_TAIL_LINES = 100            # minimum lines for tail mode
 SEARCH_EXEC_TIMEOUT = 30        # remote command execution timeout
 
-# Precompiled regex for grep output line numbers
-LINE_NUM_RE = re.compile(r'^(\d+)([:=\-])(.*)$')
+# Precompiled multiline regex over the whole grep -n output, one match per kept line:
+#  group 1: content after "<lineno><sep>[:...][ws]" (sep is ':', '-' or '=')
+#  group 2: any other non-blank line that is not a "--" context separator, with leading colons/whitespace dropped
+# Blank lines and separators do not match at all, so no per-line strip/split is needed.
+GREP_LINE_RE = re.compile(r'^(?:\d+[:=\-]:*[^\S\n]*(.*)|(?![^\S\n]*--[^\S\n]*$)(?=[^\n]*\S):*[^\S\n]*(.*))$', re.M)
+
+# 远端文件列表：依次尝试 GNU find -printf、BSD stat、ls，输出首行为所用方式（find/stat/ls）
+_LIST_FILES_SCRIPT = (
+	"if out=$(find {d} -maxdepth 1 -type f -printf '%s\t%TY-%Tm-%Td %TH:%TM:%TS\t%CY-%Cm-%Cd %CH:%CM:%CS\t%p\n' 2>/dev/null) && [ -n \"$out\" ]; then printf 'find\\n%s\\n' \"$out\"; "
+	"elif out=$(find {d} -maxdepth 1 -type f -exec stat -f '%N|%z|%SB|%Sm|%N' -t '%Y-%m-%d %H:%M:%S' {{}} \\; 2>/dev/null) && [ -n \"$out\" ]; then printf 'stat\\n%s\\n' \"$out\"; "
+	"elif out=$(ls -la {d} | grep '^-') && [ -n \"$out\" ]; then printf 'ls\\n%s\\n' \"$out\"; fi"
+)
+
+# ERE 元字符；不含这些字符的"正则"关键字与固定字符串匹配结果相同，可直接用 grep -F
+_REGEX_META_RE = re.compile(r'[.\[\]()*+?{}|^$\\]')
 
 # Load settings
 settings = Settings()
 
 
+@lru_cache(maxsize=128)
+def _command_template(search_mode: str, use_regex: bool, context_span: int, is_gz: bool, has_keyword: bool, ascii_keyword: bool = False) -> str:
+	"""Build the remote command skeleton for one search-parameter shape.
+
+	The result contains ``{file}`` / ``{kw}`` placeholders for the shell-quoted
+	file path and keyword, so repeated searches only pay for the substitution.
+	"""
+	source = "gzip -dc {file}" if is_gz else None
+	# tail 模式，或没有关键字时直接取最近的若干行
+	if search_mode == 'tail' or not has_keyword:
+		n = max(SINGLE_HOST_TAIL_RECENT, context_span) if search_mode == 'tail' else SINGLE_HOST_TAIL_RECENT
+		return f"{source} | tail -n {n}" if is_gz else f"tail -n {n} {{file}}"
+	grep_cmd = 'grep -nE' if use_regex else 'grep -nF'
+	# 纯 ASCII 的固定字符串在 C locale 下逐字节匹配，结果与 UTF-8 locale 相同但更快，
+	# 且不会把含 GBK 等非 UTF-8 字节的文件当作二进制文件；正则的 . / [^...] 在 C locale 下按字节匹配，语义不同，保持原 locale
+	if ascii_keyword and not use_regex:
+		grep_cmd = 'LC_ALL=C ' + grep_cmd
+	if search_mode == 'context' and context_span > 0:
+		grep_cmd += f" -C {context_span}"
+	cmd = f"{source} | {grep_cmd} {{kw}}" if is_gz else f"{grep_cmd} {{kw}} {{file}}"
+	# 使用 tail 获取最新的匹配结果。grep 在管道中间，退出码会被 tail 覆盖：
+	# 经 fd 3 取回 grep 自己的退出码作为整条命令的退出码（0 有匹配、1 无匹配、2 出错），不依赖 bash 的 pipefail
+	return "exec 4>&1; rc=$({{ {{ " + cmd + f"; echo $? >&3; }}}} | tail -n {settings.MAX_SEARCH_RESULTS} >&4; }}}} 3>&1); exit $rc"
+
+
 class LogSearchService:
 	def __init__(self, shared_executor: Optional[ThreadPoolExecutor] = None, max_workers: Optional[int] = None):
 		"""Create service.
 
 		Parameters:
 		shared_executor: externally managed ThreadPoolExecutor (no internal shutdown)
-		max_workers: if provided (and no shared_executor), create internal executor capped 1..20
+		max_workers: if provided (and no shared_executor), size of the internal executor;
+		  defaults to settings.SEARCH_MAX_WORKERS (LOG_SEARCH_THREADS)
 		"""
-		self.ssh_manager = SSHConnectionManager()
+		if max_workers is None:
+			max_workers = settings.SEARCH_MAX_WORKERS
+		max_workers = max(1, max_workers)
+		# 连接池至少能容纳一轮并发的主机数，避免扇出时互相淘汰刚建立的连接
+		self.ssh_manager = SSHConnectionManager(max_connections=max(20, max_workers))
 		self._encoding_detector = EncodingDetector()  # 编码检测器
 		self._external_executor = shared_executor is not None
 		if shared_executor:
 			self._executor = shared_executor
 		else:
-			if max_workers is None:
-				max_workers = 10
-			max_workers = max(1, min(20, max_workers))
 			self._executor = ThreadPoolExecutor(max_workers=max_workers)
 
 	def search_multi_host(self, log_config: Dict[str, Any], search_params: SearchParams) -> MultiHostSearchResult:
 		search_params.validate()
-		sshs = log_config.get('sshs', [])
+		# 复制每个 ssh 配置：下面会注入 ssh_index，而配置对象可能来自共享缓存
+		sshs = [dict(ssh) for ssh in log_config.get('sshs', [])]
 		if not sshs:
 			raise ValueError("日志配置中没有SSH主机")
 		log_name = log_config['name']
 		# 顶层路径用于兼容，优先使用每个 ssh 下的 path
 		legacy_path = log_config.get('path')
 		start = time.time()
-		results: List[SearchResult] = []
 		if len(sshs) == 1:
 			ssh0 = sshs[0]
 			log_path0 = ssh0.get('path') or legacy_path or ''
 			# 注入 ssh_index 以便前端使用 host|index 进行区分
 			ssh0['ssh_index'] = 0
-			results.append(self._search_single_host(ssh0, log_path0, search_params, 0))
+			results: List[SearchResult] = [self._search_single_host(ssh0, log_path0, search_params, 0)]
 			parallel = False
 		else:
-			# Reuse shared/internal executor
+			# Reuse shared/internal executor; 结果按 ssh_index 直接落位，无需事后排序
+			results = [None] * len(sshs)
 			fut_map = {}
 			for i, cfg in enumerate(sshs):
 				cfg['ssh_index'] = i
@@ -79,14 +121,13 @@ class LogSearchService:
 				fut_map[fut] = i
 			for fut in as_completed(fut_map):  # pragma: no cover - concurrency timing nondeterministic
 				i = fut_map[fut]
-				cfg = sshs[i]
 				try:
-					results.append(fut.result(timeout=SEARCH_EXEC_TIMEOUT))
+					results[i] = fut.result(timeout=SEARCH_EXEC_TIMEOUT)
 				except Exception as e:
-					logger.error(f"搜索失败 {cfg.get('host')}: {e}")
-					results.append(SearchResult(host=cfg.get('host', 'unknown'), ssh_index=i, results=[], total_results=0, search_time=0.0, file_path='', success=False, error=str(e)))
+					cfg = sshs[i]
+					logger.error("搜索失败 %s: %s", cfg.get('host'), e)
+					results[i] = SearchResult(host=cfg.get('host', 'unknown'), ssh_index=i, results=[], total_results=0, search_time=0.0, file_path='', success=False, error=str(e))
 			parallel = True
-		results.sort(key=lambda r: r.ssh_index)
 		total = sum(r.total_results for r in results if r.success)
 		elapsed = time.time() - start
 		return MultiHostSearchResult(log_name=log_name, keyword=search_params.keyword, search_params={'keyword': search_params.keyword, 'search_mode': search_params.search_mode, 'context_span': search_params.context_span, 'use_regex': search_params.use_regex}, total_hosts=len(sshs), hosts=results, total_results=total, total_search_time=elapsed, parallel_execution=parallel, aggregated_truncation={})
@@ -102,50 +143,36 @@ class LogSearchService:
 		preferred_encoding = self._encoding_detector.get_cached_encoding(cache_key)
 		
 		try:
-			# 如果没有缓存的编码，先检测
-			if not preferred_encoding:
-				try:
-					conn = self.ssh_manager.get_connection(ssh_config)
-					if conn:
-						stdout_locale, _, _ = conn.execute_command('locale | grep LC_CTYPE', timeout=5)
-						if stdout_locale:
-							detected = self._encoding_detector.detect_from_locale(stdout_locale)
-							if detected:
-								preferred_encoding = detected
-								self._encoding_detector.cache_encoding(cache_key, detected)
-				except Exception as e:
-					logger.debug(f"[{host}] encoding detection failed: {e}")
-			
+			conn = self.ssh_manager.get_connection(ssh_config)
+			if not conn:
+				raise RuntimeError("SSH连接失败")
+			# 没有按文件内容修正过的编码时，直接用连接建立时已检测（并缓存）的系统编码，不再单独执行一次 locale
 			if not preferred_encoding:
-				preferred_encoding = 'utf-8'  # 默认
+				preferred_encoding = conn.remote_encoding or 'utf-8'
 			
 			# 同时获取解析后的实际文件路径，避免下载时仍然携带占位符
 			command, resolved_file_path = self._build_search_command(log_path, search_params, ssh_config)
-			conn = self.ssh_manager.get_connection(ssh_config)
-			if not conn:
-				raise RuntimeError("SSH连接失败")
-			stdout, stderr, code = conn.execute_command(command, timeout=SEARCH_EXEC_TIMEOUT)
-			if code != 0 and stderr:
-				raise RuntimeError(f"搜索命令执行失败: {stderr}")
+			# 取原始字节，只在此处按首选编码解码一次（避免 解码→UTF-8 编码→再解码 的往返拷贝）
+			stdout, stderr, code = conn.execute_command_bytes(command, timeout=SEARCH_EXEC_TIMEOUT)
+			# 关键字搜索的退出码就是 grep 的：2 表示出错（文件不存在、无权限、正则无效等），与 -E/-F 无关
+			if code >= 2 or (code != 0 and stderr):
+				raise RuntimeError(f"搜索命令执行失败: {safe_decode(stderr, preferred_encoding)}")
 			
 			# 使用智能解码
-			decoded_output, used_encoding = smart_decode(stdout.encode('utf-8') if isinstance(stdout, str) else stdout, preferred_encoding=preferred_encoding)
+			decoded_output, used_encoding = smart_decode(stdout, preferred_encoding=preferred_encoding)
 			
 			# 更新缓存的编码
 			if used_encoding and used_encoding != preferred_encoding:
 				self._encoding_detector.cache_encoding(cache_key, used_encoding)
 			
-			lines = decoded_output.strip().split('\n') if decoded_output.strip() else []
 			has_line_numbers = ('grep -n' in command)
-			results, matches = self._parse_grep_output(lines, resolved_file_path, has_line_numbers=has_line_numbers)
+			results = self._parse_grep_output(decoded_output, has_line_numbers=has_line_numbers)
 			# 后端行数限制（保护前端渲染性能）
-			from app.models import SearchParams as _SP  # 局部导入避免循环
-			if isinstance(search_params, _SP) and search_params.max_lines:
+			if search_params.max_lines:
 				limit = search_params.max_lines
 				if limit and len(results) > limit:
 					# 始终保留最新的日志行（结果按时间正序，取末尾 limit 条）
 					results = results[-limit:]
-					matches = matches[-limit:]
 			elapsed = time.time() - start
 			return SearchResult(
 				host=host,
@@ -163,9 +190,9 @@ class LogSearchService:
 	def _build_search_command(self, log_path: str, search_params: SearchParams, ssh_config: Dict[str, Any]):
 		file_path = self._resolve_effective_file_path(log_path, search_params, ssh_config)
 		file_path = self._expand_placeholders(file_path, ssh_config)
-		quoted_file, is_gz, decompress = self._prepare_file_usage(file_path)
+		quoted_file, is_gz = self._prepare_file_usage(file_path)
 		# Build command
-		cmd = self._compose_command(search_params, quoted_file, is_gz, decompress)
+		cmd = self._compose_command(search_params, quoted_file, is_gz)
 		return cmd, file_path
 
 	def _resolve_effective_file_path(self, log_path: str, search_params: SearchParams, ssh_config: Dict[str, Any]) -> str:
@@ -188,47 +215,24 @@ class LogSearchService:
 		return log_path
 
 	def _expand_placeholders(self, file_path: str, ssh_config: Dict[str, Any]) -> str:
-		if any(ph in file_path for ph in ['{YYYY}', '{MM}', '{DD}', '{N}']):
+		if has_placeholders(file_path):
 			try:
 				conn = self.ssh_manager.get_connection(ssh_config)
 				return resolve_log_filename(file_path, ssh_conn=conn)
 			except Exception as e:
-				logger.warning(f"文件名通配符解析失败: {file_path} - {e}")
+				logger.warning("文件名通配符解析失败: %s - %s", file_path, e)
 				return file_path
 		return file_path
 
 	def _prepare_file_usage(self, file_path: str):
-		quoted_file = shlex.quote(file_path)
-		is_gz = file_path.endswith('.gz')
-		decompress = f"gzip -dc {quoted_file}" if is_gz else None
-		return quoted_file, is_gz, decompress
-
-	def _tail_builder(self, is_gz: bool, decompress: Optional[str], quoted_file: str, n: int) -> str:
-		if is_gz:
-			return f"{decompress} | tail -n {n}"
-		return f"tail -n {n} {quoted_file}"
-
-	def _compose_command(self, search_params: SearchParams, quoted_file: str, is_gz: bool, decompress: Optional[str]) -> str:
-		# tail mode
-		if search_params.search_mode == 'tail':
-			lines = max(SINGLE_HOST_TAIL_RECENT, search_params.context_span)
-			cmd = self._tail_builder(is_gz, decompress, quoted_file, lines)
-			return cmd
-		# non-tail
-		if not search_params.keyword:
-			cmd = self._tail_builder(is_gz, decompress, quoted_file, SINGLE_HOST_TAIL_RECENT)
-			return cmd
-		grep_cmd = 'grep -nE' if search_params.use_regex else 'grep -nF'
-		if search_params.search_mode == 'context' and search_params.context_span > 0:
-			grep_cmd += f" -C {search_params.context_span}"
-		escaped_keyword = shlex.quote(search_params.keyword)
-		if is_gz:
-			cmd = f"{decompress} | {grep_cmd} {escaped_keyword}"
-		else:
-			cmd = f"{grep_cmd} {escaped_keyword} {quoted_file}"
-		# 使用 tail 获取最新的匹配结果
-		cmd += f" | tail -n {settings.MAX_SEARCH_RESULTS}"
-		return cmd
+		return shlex.quote(file_path), file_path.endswith('.gz')
+
+	def _compose_command(self, search_params: SearchParams, quoted_file: str, is_gz: bool) -> str:
+		keyword = search_params.keyword
+		# 勾选了正则但关键字里没有任何元字符时按固定字符串搜索（grep -F 更快，结果相同）
+		use_regex = search_params.use_regex and _REGEX_META_RE.search(keyword) is not None
+		template = _command_template(search_params.search_mode, use_regex, search_params.context_span, is_gz, bool(keyword), keyword.isascii())
+		return template.format(file=quoted_file, kw=search_params.escaped_keyword)
 
 	def get_log_files(self, ssh_config: Dict[str, Any], log_path: str) -> List[Dict[str, Any]]:
 		try:
@@ -237,44 +241,53 @@ class LogSearchService:
 			conn = self.ssh_manager.get_connection(ssh_config)
 			if not conn:
 				raise RuntimeError('SSH连接失败')
-			linux_cmd = f"find '{log_dir}' -maxdepth 1 -type f -printf '%f\t%s\t%TY-%Tm-%Td %TH:%TM:%TS\t%CY-%Cm-%Cd %CH:%CM:%CS\t%p\n' 2>/dev/null"
-			stdout, stderr, code = conn.execute_command(linux_cmd)
-			if code == 0 and stdout.strip():
-				return self._parse_linux_find_output(stdout, host)
-			mac_cmd = f"find '{log_dir}' -maxdepth 1 -type f -exec stat -f '%N|%z|%SB|%Sm|%N' -t '%Y-%m-%d %H:%M:%S' {{}} \\; 2>/dev/null"
-			stdout, stderr, code = conn.execute_command(mac_cmd)
-			if code == 0 and stdout.strip():
-				return self._parse_macos_stat_output(stdout, host)
-			ls_cmd = f"ls -la '{log_dir}' | grep '^-'"
-			stdout, stderr, code = conn.execute_command(ls_cmd)
-			if code == 0 and stdout.strip():
-				return self._parse_ls_output(stdout, log_dir, host)
-			logger.warning(f"[{host}] 无法获取目录 {log_dir} 的文件列表")
+			# find -printf / BSD stat / ls 三种方式在远端依次尝试，一次往返返回第一个有输出的结果（首行标明来源）
+			stdout, stderr, code = conn.execute_command(_LIST_FILES_SCRIPT.format(d=shlex.quote(log_dir)))
+			kind, _, body = stdout.partition('\n')
+			if code == 0 and body:
+				if kind == 'find':
+					return self._parse_linux_find_output(body, host)
+				if kind == 'stat':
+					return self._parse_macos_stat_output(body, host)
+				if kind == 'ls':
+					return self._parse_ls_output(body, log_dir, host)
+			logger.warning("[%s] 无法获取目录 %s 的文件列表", host, log_dir)
 			return []
 		except Exception as e:  # pragma: no cover - network
-			logger.error(f"[{ssh_config.get('host', 'unknown')}] 获取文件列表失败: {e}")
+			logger.error("[%s] 获取文件列表失败: %s", ssh_config.get('host', 'unknown'), e)
 			return []
 
+	def get_log_files_multi(self, targets: List[Tuple[Dict[str, Any], str]]) -> List[List[Dict[str, Any]]]:
+		"""List files for several (ssh_config, log_path) targets, one list per target in input order.
+
+		Multiple hosts are queried concurrently on the search executor.
+		"""
+		if len(targets) <= 1:
+			return [self.get_log_files(cfg, path) for cfg, path in targets]
+		return list(self._executor.map(lambda t: self.get_log_files(*t), targets))
+
 	def _parse_linux_find_output(self, stdout: str, host: str) -> List[Dict[str, Any]]:
 		files: List[Dict[str, Any]] = []
-		for line in stdout.strip().split('\n'):
+		# 空行在循环内跳过，不对整段输出先 strip（也不会削掉首个文件名的前导空格）
+		for line in stdout.split('\n'):
 			if not line.strip():
 				continue
-			parts = line.split('\t')
-			if len(parts) >= 5:
+			# 完整路径是唯一可能含 \t 的字段且在最后一列，最多切 3 次即可保持完整；文件名由路径取得
+			parts = line.split('\t', 3)
+			if len(parts) == 4:
 				try:
-					files.append({'filename': parts[0], 'full_path': parts[4], 'size': int(parts[1]), 'birth_time': parts[3], 'modified_time': parts[2], 'host': host})
+					files.append({'filename': os.path.basename(parts[3]), 'full_path': parts[3], 'size': int(parts[0]), 'birth_time': parts[2], 'modified_time': parts[1], 'host': host})
 				except Exception:
 					continue
 		return files
 
 	def _parse_macos_stat_output(self, stdout: str, host: str) -> List[Dict[str, Any]]:
 		files: List[Dict[str, Any]] = []
-		for line in stdout.strip().split('\n'):
+		for line in stdout.split('\n'):
 			if not line.strip():
 				continue
-			parts = line.split('|')
-			if len(parts) >= 5:
+			parts = line.split('|', 4)
+			if len(parts) == 5:
 				try:
 					filename = os.path.basename(parts[0])
 					files.append({'filename': filename, 'full_path': parts[4], 'size': int(parts[1]), 'birth_time': parts[2], 'modified_time': parts[3], 'host': host})
@@ -284,7 +297,7 @@ class LogSearchService:
 
 	def _parse_ls_output(self, stdout: str, log_dir: str, host: str) -> List[Dict[str, Any]]:
 		files: List[Dict[str, Any]] = []
-		for line in stdout.strip().split('\n'):
+		for line in stdout.split('\n'):
 			if not line.strip():
 				continue
 			parts = line.split()
@@ -303,8 +316,8 @@ class LogSearchService:
 				files.append({'filename': filename, 'full_path': os.path.join(log_dir, filename), 'size': size, 'birth_time': modified, 'modified_time': modified, 'host': host})
 		return files
 
-	def _parse_grep_output(self, lines: List[str], file_path: str, has_line_numbers: bool = True) -> Tuple[List[str], List[Dict[str, Any]]]:
-		"""Parse command output into clean lines and match metadata.
+	def _parse_grep_output(self, output: str, has_line_numbers: bool = True) -> List[str]:
+		"""Parse command output into clean lines.
 
 		If has_line_numbers is True (i.e., grep -n/-nC was used), remove the leading
 		"<lineno><sep>" prefix where <sep> is one of ':', '-', '=' and skip grep's
@@ -315,29 +328,14 @@ class LogSearchService:
 		  123:actual log line
 		  123-actual log line (before context)
 		  123=actual log line (after context)
+
+		Only the content is kept: SearchResult carries plain lines, so no per-line
+		match records (file/line number/content dicts) are built.
 		"""
-		clean_results: List[str] = []
-		matches: List[Dict[str, Any]] = []
-		for raw in lines:
-			if not raw.strip():
-				continue
-			if has_line_numbers and raw.strip() == '--':  # grep context separator
-				continue
-			orig_line_number = None
-			content = raw
-			if has_line_numbers:
-				m = LINE_NUM_RE.match(raw)
-				if m:
-					try:
-						orig_line_number = int(m.group(1))
-						content = m.group(3)
-					except Exception:
-						orig_line_number = None
-				# 再次剥离前导冒号/空白（仅在存在行号时需要）
-				content = content.lstrip(':').lstrip()
-			clean_results.append(content)
-			matches.append({'file_path': file_path, 'line_number': orig_line_number, 'content': content})
-		return clean_results, matches
+		if has_line_numbers:
+			# 一次 findall 扫完整段输出；每行只有一个分组非空（带行号时取第 1 组，否则取第 2 组）
+			return [numbered or other for numbered, other in GREP_LINE_RE.findall(output)]
+		return [line for line in output.split('\n') if line.strip()]
 
 	def close(self):  # pragma: no cover
 		self.ssh_manager.close_all()
@@ -348,4 +346,10 @@ class LogSearchService:
 			except Exception:
 				pass
 
-__all__ = ['LogSearchService']
+
+@cache
+def get_search_service() -> LogSearchService:
+	"""进程内共享的 LogSearchService：各路由共用同一个 SSH 连接池，避免每个实例各自建连认证"""
+	return LogSearchService()
+
+__all__ = ['LogSearchService', 'get_search_service']
@@ -13,10 +13,14 @@ import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, asdict
+from app.services.ssh import SFTPReadahead
 from app.services.utils.encoding import EncodingDetector, smart_decode
 
 logger = logging.getLogger(__name__)
 
+BATCH_ZIP_SPOOL_BYTES = 32 * 1024 * 1024  # 批量下载 ZIP 超过该大小才写入临时文件
+BATCH_COPY_CHUNK = 1024 * 1024           # 远端文件写入 ZIP 时的复制块大小
+
 
 @dataclass
 class SFTPConnection:
@@ -100,13 +104,18 @@ class SFTPService:
 			pass
 		return {"message": f"已断开连接 {connection_id}", "connection_id": connection_id}
 
+	def _sftp(self, connection_id: str) -> paramiko.SFTPClient:
+		"""按 connection_id 取 SFTP 客户端（单次字典查找），不存在时抛出 ValueError"""
+		cd = self.connections.get(connection_id)
+		if cd is None:
+			raise ValueError("SFTP连接不存在")
+		return cd['sftp']
+
 	def get_connections(self) -> Dict[str, Any]:
 		return {"connections": [asdict(c) for c in self.connection_info.values()], "total": len(self.connection_info)}
 
 	def list_directory(self, connection_id: str, path: str = '.') -> Dict[str, Any]:
-		if connection_id not in self.connections:
-			raise ValueError("SFTP连接不存在")
-		sftp = self.connections[connection_id]['sftp']
+		sftp = self._sftp(connection_id)
 		info = self.connection_info.get(connection_id)
 		host = info.host if info else 'unknown'
 		
@@ -200,70 +209,75 @@ class SFTPService:
 			'total_items': len(items)
 		}
 
-	def download_file(self, connection_id: str, remote_path: str) -> Tuple[str, str]:
-		if connection_id not in self.connections:
-			raise ValueError("SFTP连接不存在")
-		sftp = self.connections[connection_id]['sftp']
-		filename = posixpath.basename(remote_path)
-		tmp = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{filename}")
-		tmp_path = tmp.name
-		tmp.close()
-		sftp.get(remote_path, tmp_path)
-		return tmp_path, filename
+	def open_remote(self, connection_id: str, remote_path: str) -> Tuple[SFTPReadahead, str, int]:
+		"""打开远端文件用于流式下载，返回 (文件对象, 文件名, 大小)；调用方负责关闭文件对象"""
+		sftp = self._sftp(connection_id)
+		fp = sftp.open(remote_path, 'rb')
+		try:
+			size = fp.stat().st_size
+		except Exception:
+			fp.close()
+			raise
+		# 按有界窗口预读后续数据块：顺序读取时不必每块等待一次往返，客户端再慢内存也只占一个窗口
+		return SFTPReadahead(fp, size), posixpath.basename(remote_path), size
 
-	def batch_download(self, connection_id: str, paths: List[str]) -> Tuple[str, str]:
-		if connection_id not in self.connections:
-			raise ValueError("SFTP连接不存在")
+	def batch_download(self, connection_id: str, paths: List[str]) -> Tuple[Any, str, int]:
+		"""将多个远端文件/目录直接打包为 ZIP，返回 (已回到开头的文件对象, 文件名, 大小)
+
+		远端文件边读边写入 ZIP，不再先落地到临时目录；ZIP 本身写入 SpooledTemporaryFile，
+		较小时留在内存，超过阈值才落盘。
+		"""
+		sftp = self._sftp(connection_id)
 		if not paths:
 			raise ValueError("没有需要下载的文件")
-		sftp = self.connections[connection_id]['sftp']
-		staging = tempfile.mkdtemp(prefix='sftp_batch_')
+		buf = tempfile.SpooledTemporaryFile(max_size=BATCH_ZIP_SPOOL_BYTES, suffix='.zip')
+
+		def add_file(zf: zipfile.ZipFile, remote: str, arcname: str, size: int):
+			try:
+				with SFTPReadahead(sftp.open(remote, 'rb'), size) as src:
+					with zf.open(arcname, 'w', force_zip64=True) as dst:
+						shutil.copyfileobj(src, dst, BATCH_COPY_CHUNK)
+			except Exception:
+				pass
 
-		def fetch_dir(remote_dir: str, local_dir: str):
-			os.makedirs(local_dir, exist_ok=True)
+		def add_dir(zf: zipfile.ZipFile, remote_dir: str, arc_dir: str):
 			for item in sftp.listdir_attr(remote_dir):
 				rp = posixpath.join(remote_dir, item.filename)
-				lp = os.path.join(local_dir, item.filename)
+				ap = posixpath.join(arc_dir, item.filename)
 				if stat.S_ISDIR(item.st_mode):
-					fetch_dir(rp, lp)
+					add_dir(zf, rp, ap)
 				else:
+					add_file(zf, rp, ap, item.st_size)
+
+		used = set()
+		try:
+			with zipfile.ZipFile(buf, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+				for rp in paths:
+					rp = posixpath.normpath(rp)
+					base = posixpath.basename(rp.rstrip('/')) or 'root'
+					final = base
+					count = 2
+					while final in used:
+						final = f"{base}_{count}"
+						count += 1
 					try:
-						sftp.get(rp, lp)
+						attr = sftp.stat(rp)
+						if stat.S_ISDIR(attr.st_mode):
+							add_dir(zf, rp, final)
+						else:
+							add_file(zf, rp, final, attr.st_size)
 					except Exception:
-						pass
-
-		for rp in paths:
-			rp = posixpath.normpath(rp)
-			base = posixpath.basename(rp.rstrip('/')) or 'root'
-			final = base
-			count = 2
-			while os.path.exists(os.path.join(staging, final)):
-				final = f"{base}_{count}"
-				count += 1
-			target = os.path.join(staging, final)
-			try:
-				attr = sftp.stat(rp)
-				if stat.S_ISDIR(attr.st_mode):
-					fetch_dir(rp, target)
-				else:
-					sftp.get(rp, target)
-			except Exception:
-				continue
-		zip_path = tempfile.NamedTemporaryFile(delete=False, suffix='.zip').name
-		zip_name = f"batch_{int(time.time())}.zip"
-		with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
-			for root, _, files in os.walk(staging):
-				for f in files:
-					ap = os.path.join(root, f)
-					rp = os.path.relpath(ap, staging)
-					zf.write(ap, rp)
-		shutil.rmtree(staging, ignore_errors=True)
-		return zip_path, zip_name
+						continue
+					used.add(final)
+			size = buf.tell()
+			buf.seek(0)
+		except Exception:
+			buf.close()
+			raise
+		return buf, f"batch_{int(time.time())}.zip", size
 
 	def upload_file(self, connection_id: str, local_file_path: str, remote_path: str, filename: Optional[str] = None) -> Dict[str, Any]:
-		if connection_id not in self.connections:
-			raise ValueError("SFTP连接不存在")
-		sftp = self.connections[connection_id]['sftp']
+		sftp = self._sftp(connection_id)
 		if filename is None:
 			filename = os.path.basename(local_file_path)
 		remote_file_path = posixpath.join(remote_path, filename)
@@ -271,18 +285,21 @@ class SFTPService:
 		size = os.path.getsize(local_file_path)
 		return {"message": f"文件 {filename} 上传成功", "remote_path": remote_file_path, "file_size": size}
 
+	def upload_stream(self, connection_id: str, fileobj, remote_path: str, filename: str) -> Dict[str, Any]:
+		"""直接从文件对象（如上传请求的流）写入远端，不经过本地临时文件"""
+		sftp = self._sftp(connection_id)
+		remote_file_path = posixpath.join(remote_path, filename)
+		attrs = sftp.putfo(fileobj, remote_file_path)
+		return {"message": f"文件 {filename} 上传成功", "remote_path": remote_file_path, "file_size": attrs.st_size}
+
 	def create_directory(self, connection_id: str, remote_path: str, dir_name: str) -> Dict[str, Any]:
-		if connection_id not in self.connections:
-			raise ValueError("SFTP连接不存在")
-		sftp = self.connections[connection_id]['sftp']
+		sftp = self._sftp(connection_id)
 		full = posixpath.join(remote_path, dir_name)
 		sftp.mkdir(full)
 		return {"message": f"目录 {dir_name} 创建成功", "full_path": full}
 
 	def delete_item(self, connection_id: str, remote_path: str, is_directory: bool = False) -> Dict[str, Any]:
-		if connection_id not in self.connections:
-			raise ValueError("SFTP连接不存在")
-		sftp = self.connections[connection_id]['sftp']
+		sftp = self._sftp(connection_id)
 		if is_directory:
 			sftp.rmdir(remote_path)
 			t = 'directory'
@@ -1,5 +1,5 @@
 """SSH connection management services."""
 
-from .manager import SSHConnectionManager  # noqa: F401
+from .manager import SSHConnectionManager, SFTPReadahead  # noqa: F401
 
-__all__ = ['SSHConnectionManager']
+__all__ = ['SSHConnectionManager', 'SFTPReadahead']
@@ -1,16 +1,25 @@
 """SSH connection management implementation (migrated)."""
 
+import io
+import shlex
 import paramiko
 import threading
 import time
 import logging
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 from concurrent.futures import ThreadPoolExecutor, Future
 from app.config.system_settings import Settings
 from app.services.utils.encoding import EncodingDetector, smart_decode
 
 logger = logging.getLogger(__name__)
 
+CONNECTION_IDLE_TIMEOUT = 300  # 空闲超过该秒数的连接会被回收
+CLEANUP_SWEEP_INTERVAL = 30    # 取连接时顺带全池清扫的最小间隔（后台线程另有定期清扫）
+KEEPALIVE_INTERVAL = 30        # SSH 层 keepalive 间隔，避免中间设备断开空闲连接
+RECV_CHUNK_SIZE = 256 << 10    # 读取命令输出的单次块大小（paramiko 默认按 8 KiB 读）
+SFTP_READAHEAD_REQUESTS = 16   # SFTP 预读每个窗口并发的读请求数（每个 32 KiB，窗口 512 KiB）
+
 
 class SSHConnection:
 	"""Encapsulates a single SSH connection with thread-safe exec."""
@@ -23,6 +32,7 @@ class SSHConnection:
 		self.lock = threading.Lock()
 		self._settings = Settings()
 		self._remote_encoding: Optional[str] = None  # 缓存远程编码
+		self._command_cache: Dict[str, bool] = {}  # 远端命令是否可用的探测结果
 
 	def connect(self) -> bool:
 		try:
@@ -37,6 +47,9 @@ class SSHConnection:
 			if 'password' in self.config:
 				params['password'] = self.config['password']
 			self.client.connect(**params)
+			transport = self.client.get_transport()
+			if transport:
+				transport.set_keepalive(KEEPALIVE_INTERVAL)
 			self.connected = True
 			self.last_used = time.time()
 			logger.info(f"SSH连接成功: {self.config['host']}")
@@ -82,26 +95,83 @@ class SSHConnection:
 			logger.warning(f"无法检测远程编码，使用 UTF-8: {e}")
 			self._remote_encoding = 'utf-8'
 
-	def execute_command(self, command: str, timeout: int | None = None) -> tuple[str, str, int]:
+	def execute_command_bytes(self, command: str, timeout: int | None = None) -> tuple[bytes, bytes, int]:
+		"""执行命令并返回原始字节输出，由调用方决定如何解码"""
 		if not self.connected or not self.client:
 			raise RuntimeError("SSH连接未建立")
 		with self.lock:
 			_effective_timeout = timeout if timeout is not None else self._settings.SSH_TIMEOUT
 			stdin, stdout, stderr = self.client.exec_command(command, timeout=_effective_timeout)
-			raw_out = stdout.read() or b""
+			# 直接按大块从通道读取 stdout，减少大输出时的循环次数
+			channel = stdout.channel
+			buf = bytearray()
+			while True:
+				chunk = channel.recv(RECV_CHUNK_SIZE)
+				if not chunk:
+					break
+				buf += chunk
+			raw_out = bytes(buf)
 			raw_err = stderr.read() or b""
-			
-			# 使用智能解码，传入检测到的编码作为首选
-			out, encoding_used = smart_decode(raw_out, preferred_encoding=self._remote_encoding)
-			err, _ = smart_decode(raw_err, preferred_encoding=self._remote_encoding)
-			
-			# 如果实际使用的编码与检测的不同，记录日志
-			if encoding_used != self._remote_encoding:
-				logger.debug(f"实际使用编码 {encoding_used} 与检测编码 {self._remote_encoding} 不同")
-			
 			exit_code = stdout.channel.recv_exit_status()
 			self.last_used = time.time()
-			return out, err, exit_code
+			return raw_out, raw_err, exit_code
+
+	def execute_command(self, command: str, timeout: int | None = None) -> tuple[str, str, int]:
+		raw_out, raw_err, exit_code = self.execute_command_bytes(command, timeout=timeout)
+		
+		# 使用智能解码，传入检测到的编码作为首选
+		out, encoding_used = smart_decode(raw_out, preferred_encoding=self._remote_encoding)
+		err, _ = smart_decode(raw_err, preferred_encoding=self._remote_encoding)
+		
+		# 如果实际使用的编码与检测的不同，记录日志
+		if encoding_used != self._remote_encoding:
+			logger.debug(f"实际使用编码 {encoding_used} 与检测编码 {self._remote_encoding} 不同")
+		return out, err, exit_code
+
+	@property
+	def remote_encoding(self) -> Optional[str]:
+		return self._remote_encoding
+
+	def open_file(self, remote_path: str, timeout: int | None = None) -> 'RemoteFile':
+		"""以只读方式打开远程文件（独立 SFTP 通道），供流式读取使用。"""
+		if not self.connected or not self.client:
+			raise RuntimeError("SSH连接未建立")
+		sftp = self.client.open_sftp()
+		try:
+			handle = sftp.open(remote_path, 'rb')
+			handle.settimeout(timeout if timeout is not None else self._settings.SSH_TIMEOUT)
+		except Exception:
+			sftp.close()
+			raise
+		self.last_used = time.time()
+		return RemoteFile(self, sftp, handle)
+
+	def has_command(self, name: str) -> bool:
+		"""探测远端是否提供某命令（每个连接只探测一次）"""
+		cached = self._command_cache.get(name)
+		if cached is None:
+			try:
+				out, _, code = self.execute_command_bytes(f"command -v {shlex.quote(name)} >/dev/null 2>&1 && echo ok", timeout=5)
+				cached = code == 0 and out.strip() == b'ok'
+			except Exception as e:
+				logger.debug(f"探测远端命令 {name} 失败: {e}")
+				cached = False
+			self._command_cache[name] = cached
+		return cached
+
+	def open_command_stream(self, command: str, timeout: int | None = None) -> 'RemoteCommandStream':
+		"""执行命令并以流的形式读取其 stdout，适合大输出（不整体缓冲）"""
+		if not self.connected or not self.client:
+			raise RuntimeError("SSH连接未建立")
+		channel = self.client.get_transport().open_session()
+		try:
+			channel.settimeout(timeout if timeout is not None else self._settings.SSH_TIMEOUT)
+			channel.exec_command(command)
+		except Exception:
+			channel.close()
+			raise
+		self.last_used = time.time()
+		return RemoteCommandStream(self, channel)
 
 	def is_alive(self) -> bool:
 		if not self.connected or not self.client:
@@ -122,35 +192,194 @@ class SSHConnection:
 		self.connected = False
 
 
+class RemoteFile(io.RawIOBase):
+	"""Raw binary stream over an SFTP file handle.
+
+	Closing the stream also closes the SFTP channel; every read refreshes the
+	parent connection's ``last_used`` so long downloads are not reaped as idle.
+	"""
+
+	def __init__(self, conn: SSHConnection, sftp: paramiko.SFTPClient, handle: paramiko.SFTPFile):
+		super().__init__()
+		self._conn = conn
+		self._sftp = sftp
+		self._handle = handle
+		self._size: Optional[int] = None
+		self._readahead: Optional['SFTPReadahead'] = None
+
+	def readable(self) -> bool:
+		return True
+
+	@property
+	def size(self) -> int:
+		"""远端文件大小（字节），首次访问时通过 SFTP stat 获取"""
+		if self._size is None:
+			self._size = self._handle.stat().st_size
+		return self._size
+
+	def prefetch(self):
+		"""之后的顺序读取按有界窗口流水线预读（见 SFTPReadahead），避免每块一次往返"""
+		self._readahead = SFTPReadahead(self._handle, self.size)
+
+	def readinto(self, buffer) -> int:
+		if self._readahead is not None:
+			n = self._readahead.readinto(buffer)
+		else:
+			data = self._handle.read(len(buffer))
+			n = len(data)
+			buffer[:n] = data
+		self._conn.last_used = time.time()
+		return n
+
+	def close(self):
+		if not self.closed:
+			try:
+				self._handle.close()
+				self._sftp.close()
+			except Exception:
+				pass
+		super().close()
+
+
+class SFTPReadahead(io.RawIOBase):
+	"""Raw binary stream over an SFTP file that pipelines reads in bounded windows.
+
+	``SFTPFile.prefetch`` queues read requests for the whole file up front; once
+	paramiko falls back to synchronous reads mid-prefetch, every outstanding
+	response lands in its buffer and is never released, so memory can grow to the
+	file size. Here each refill issues at most ``max_requests`` concurrent 32 KiB
+	reads via ``readv`` and memory stays within about one window. Closing the
+	stream closes the handle.
+	"""
+
+	def __init__(self, handle: paramiko.SFTPFile, size: Optional[int], max_requests: int = SFTP_READAHEAD_REQUESTS):
+		super().__init__()
+		self._handle = handle
+		self._size = size or 0  # 服务器未返回大小时不预读，直接顺序读
+		self._window = max(1, max_requests) * handle.MAX_REQUEST_SIZE
+		self._pending = memoryview(b'')
+
+	def readable(self) -> bool:
+		return True
+
+	def readinto(self, buffer) -> int:
+		if not self._pending:
+			offset = self._handle.tell()
+			count = min(self._window, self._size - offset)
+			if count <= 0:
+				# 已读到打开时的文件大小（日志可能仍在追加）：之后退回普通顺序读
+				data = self._handle.read(len(buffer))
+				buffer[:len(data)] = data
+				return len(data)
+			# paramiko 的预取线程登记请求慢于响应到达时会提前判定预取结束、改为同步读，之后到达的
+			# 预取响应留在缓冲里再也不会被读取；新窗口开始前先丢弃这些位于读位置之前的残留块
+			with self._handle._prefetch_lock:
+				self._handle._prefetch_data.clear()
+			self._pending = memoryview(b''.join(self._handle.readv([(offset, count)])))
+		n = min(len(buffer), len(self._pending))
+		buffer[:n] = self._pending[:n]
+		self._pending = self._pending[n:]
+		return n
+
+	def close(self):
+		if not self.closed:
+			try:
+				self._handle.close()
+			except Exception:
+				pass
+		super().close()
+
+
+class RemoteCommandStream(io.RawIOBase):
+	"""Raw binary stream over a remote command's stdout channel."""
+
+	def __init__(self, conn: SSHConnection, channel: paramiko.Channel):
+		super().__init__()
+		self._conn = conn
+		self._channel = channel
+
+	def readable(self) -> bool:
+		return True
+
+	def readinto(self, buffer) -> int:
+		data = self._channel.recv(len(buffer))
+		n = len(data)
+		buffer[:n] = data
+		self._conn.last_used = time.time()
+		return n
+
+	def close(self):
+		if not self.closed:
+			try:
+				self._channel.close()
+			except Exception:
+				pass
+		super().close()
+
+
 class SSHConnectionManager:
-	"""Lightweight connection pool with periodic cleanup."""
+	"""Lightweight LRU connection pool with idle eviction and periodic cleanup."""
 
 	def __init__(self, max_connections: int = 20):
-		self.connections: Dict[str, SSHConnection] = {}
+		self.connections: 'OrderedDict[str, SSHConnection]' = OrderedDict()
 		self.max_connections = max_connections
 		self.lock = threading.Lock()
+		# 每个连接 key 一把建连锁：握手/认证在池锁之外进行，同一主机只建一次，不同主机互不阻塞
+		self._connect_locks: Dict[str, threading.Lock] = {}
+		self._last_sweep = 0.0
 		self.executor = ThreadPoolExecutor(max_workers=10)
 		self._start_cleanup_thread()
 
 	def _connection_key(self, cfg: Dict[str, Any]) -> str:
 		return f"{cfg['host']}:{cfg.get('port', 22)}:{cfg['username']}"
 
+	def _get_pooled(self, key: str, to_close: List[SSHConnection]) -> Optional[SSHConnection]:
+		"""返回池中可用的连接（需持有 self.lock）；失效或空闲超时的连接移出池并放入 to_close"""
+		conn = self.connections.get(key)
+		if conn is None:
+			return None
+		if conn.is_alive() and time.time() - conn.last_used <= CONNECTION_IDLE_TIMEOUT:
+			self.connections.move_to_end(key)
+			return conn
+		del self.connections[key]
+		to_close.append(conn)
+		return None
+
+	@staticmethod
+	def _close_connections(conns: List[SSHConnection]):
+		"""在池锁之外关闭连接：关闭远端 transport 可能较慢，不能阻塞其他取连接的线程"""
+		for conn in conns:
+			conn.close()
+
 	def get_connection(self, cfg: Dict[str, Any]) -> Optional[SSHConnection]:
 		key = self._connection_key(cfg)
-		with self.lock:
-			if key in self.connections:
-				conn = self.connections[key]
-				if conn.is_alive():
+		to_close: List[SSHConnection] = []
+		try:
+			with self.lock:
+				if time.time() - self._last_sweep >= CLEANUP_SWEEP_INTERVAL:
+					self._pop_stale_connections(to_close)
+				conn = self._get_pooled(key, to_close)
+				if conn:
 					return conn
-				conn.close()
-				del self.connections[key]
-			if len(self.connections) >= self.max_connections:
-				self._cleanup_old_connections()
-			conn = SSHConnection(cfg)
-			if conn.connect():
-				self.connections[key] = conn
+				connect_lock = self._connect_locks.setdefault(key, threading.Lock())
+			with connect_lock:
+				# 等锁期间其他线程可能已建好连接
+				with self.lock:
+					conn = self._get_pooled(key, to_close)
+					if conn:
+						return conn
+				conn = SSHConnection(cfg)
+				if not conn.connect():
+					return None
+				with self.lock:
+					while len(self.connections) >= self.max_connections:
+						lru_key, lru_conn = self.connections.popitem(last=False)
+						to_close.append(lru_conn)
+						logger.info(f"连接池已满，淘汰最久未使用连接: {lru_key}")
+					self.connections[key] = conn
 				return conn
-			return None
+		finally:
+			self._close_connections(to_close)
 
 	def execute_command_async(self, cfg: Dict[str, Any], command: str) -> Future:
 		def _run():
@@ -160,21 +389,23 @@ class SSHConnectionManager:
 			return conn.execute_command(command)
 		return self.executor.submit(_run)
 
-	def _cleanup_old_connections(self):
+	def _pop_stale_connections(self, to_close: List[SSHConnection]):
+		"""把空闲超时的连接移出池并放入 to_close（需持有 self.lock，关闭由调用方在锁外进行）"""
 		now = time.time()
-		stale = [k for k, c in self.connections.items() if now - c.last_used > 300]
+		self._last_sweep = now
+		stale = [k for k, c in self.connections.items() if now - c.last_used > CONNECTION_IDLE_TIMEOUT]
 		for k in stale:
-			conn = self.connections.pop(k, None)
-			if conn:
-				conn.close()
-				logger.info(f"清理老旧连接: {k}")
+			to_close.append(self.connections.pop(k))
+			logger.info(f"清理老旧连接: {k}")
 
 	def _start_cleanup_thread(self):  # pragma: no cover - background
 		def loop():
 			while True:
 				time.sleep(60)
+				to_close: List[SSHConnection] = []
 				with self.lock:
-					self._cleanup_old_connections()
+					self._pop_stale_connections(to_close)
+				self._close_connections(to_close)
 		threading.Thread(target=loop, daemon=True).start()
 
 	def close_all(self):
@@ -195,5 +426,5 @@ class SSHConnectionManager:
 			}
 
 __all__ = [
-	'SSHConnection', 'SSHConnectionManager'
+	'SSHConnection', 'SSHConnectionManager', 'RemoteFile', 'SFTPReadahead', 'RemoteCommandStream'
 ]
@@ -6,12 +6,15 @@ import uuid
 import codecs
 from datetime import datetime
 import logging
+from collections import deque
 from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, Optional, Any
 import paramiko
 
 from app.services.utils.encoding import EncodingDetector, smart_decode
 
+SESSION_HISTORY_LIMIT = 256  # 每个终端保留的最近命令条数，长时间会话内存不再无限增长
+
 
 @dataclass
 class TerminalSession:
@@ -26,11 +29,15 @@ class TerminalSession:
 	current_directory: str = "~"
 	current_prompt: str = ""
 	command_count: int = 0
-	session_history: Optional[List[Dict[str, Any]]] = None
+	session_history: Optional[Deque[Dict[str, Any]]] = None
 
 	def __post_init__(self):
-		if self.session_history is None:
-			self.session_history = []
+		self.session_history = deque(self.session_history or (), maxlen=SESSION_HISTORY_LIMIT)
+
+	def to_dict(self) -> Dict[str, Any]:
+		d = asdict(self)
+		d['session_history'] = list(self.session_history)
+		return d
 
 
 class TerminalService:
@@ -178,7 +185,7 @@ class TerminalService:
 
 	def get_terminals(self) -> Dict[str, Any]:
 		with self._lock:
-			items = [asdict(s) for s in self.session_info.values()]
+			items = [s.to_dict() for s in self.session_info.values()]
 			active = sum(1 for s in self.session_info.values() if s.status == 'connected')
 			return {"terminals": items, "total_count": len(items), "active_count": active}
 
@@ -236,8 +243,6 @@ class TerminalService:
 			sd['channel'].send(command.encode(enc, errors='ignore'))
 			si.last_activity = datetime.now().isoformat() + 'Z'
 			si.command_count += 1
-			if si.session_history is None:
-				si.session_history = []
 			si.session_history.append({'timestamp': si.last_activity, 'command': command, 'output': ''})
 		except Exception as e:
 			si.status = 'error'
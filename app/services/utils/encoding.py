@@ -16,6 +16,12 @@ _ENCODING_CANDIDATES = ['utf-8', 'gb18030', 'gbk', 'gb2312', 'big5', 'shift_jis'
 # 编码缓存：避免重复检测
 _encoding_cache: Dict[str, str] = {}
 
+_CHINESE_RE = re.compile(r'[\u4e00-\u9fff]')
+# 中文标点（一次正则扫描代替逐个子串查找）
+_CHINESE_PUNCT_RE = re.compile('[，。；：！？、《》"]')
+# 中文环境常见的 GB 系列编码
+_GB_ENCODINGS = frozenset(('gbk', 'gb18030', 'gb2312'))
+
 
 def _detect_encoding_by_bom(data: bytes) -> Optional[str]:
     """通过 BOM (Byte Order Mark) 检测编码"""
@@ -30,7 +36,7 @@ def _detect_encoding_by_bom(data: bytes) -> Optional[str]:
 
 def _has_chinese_chars(text: str) -> bool:
     """检查文本中是否包含中文字符"""
-    return bool(re.search(r'[\u4e00-\u9fff]', text))
+    return _CHINESE_RE.search(text) is not None
 
 
 def _calculate_confidence(text: str, encoding: str) -> float:
@@ -46,8 +52,8 @@ def _calculate_confidence(text: str, encoding: str) -> float:
     if text_len == 0:
         return 0.0
     
-    # 计算替换字符比例（越少越好）
-    replacement_ratio = text.count('\ufffd') / text_len
+    # 计算替换字符比例（越少越好）；绝大多数文本没有替换字符，先用 in 判断省去计数
+    replacement_ratio = text.count('\ufffd') / text_len if '\ufffd' in text else 0.0
     if replacement_ratio > 0.1:  # 超过 10% 是替换字符，基本认为失败
         return 0.0
     
@@ -55,13 +61,11 @@ def _calculate_confidence(text: str, encoding: str) -> float:
     
     # 如果包含中文字符，检查中文标点的完整性
     if _has_chinese_chars(text):
-        chinese_punctuations = ['，', '。', '；', '：', '！', '？', '、', '《', '》', '"', '"']
-        has_chinese_punct = any(p in text for p in chinese_punctuations)
-        if has_chinese_punct:
+        if _CHINESE_PUNCT_RE.search(text):
             confidence += 0.1
         
         # GBK/GB18030 在中文环境中常见，加分
-        if encoding.lower() in ['gbk', 'gb18030', 'gb2312']:
+        if encoding.lower() in _GB_ENCODINGS:
             confidence += 0.05
     
     return min(confidence, 1.0)
@@ -173,6 +177,10 @@ def smart_decode(
     if not data:
         return '', preferred_encoding or 'utf-8'
     
+    # 0. 纯 ASCII（日志中最常见）：所有候选编码结果相同，直接返回首选编码
+    if data.isascii() and (preferred_encoding is None or preferred_encoding in _ENCODING_CANDIDATES):
+        return data.decode('ascii'), preferred_encoding or 'utf-8'
+    
     # 1. 检查 BOM
     bom_encoding = _detect_encoding_by_bom(data)
     if bom_encoding:
@@ -223,7 +231,7 @@ def smart_decode(
         try:
             text = data.decode(preferred_encoding)
             # 检查替换符比例（<2% 认为成功）
-            if text.count('\ufffd') / max(len(text), 1) < 0.02:
+            if '\ufffd' not in text or text.count('\ufffd') / max(len(text), 1) < 0.02:
                 return text, preferred_encoding
         except (UnicodeDecodeError, LookupError) as e:
             logger.debug(f"首选编码 {preferred_encoding} 解码失败: {e}")
@@ -235,7 +243,7 @@ def smart_decode(
         try:
             text = data.decode(encoding)
             # 检查替换符比例
-            if text.count('\ufffd') / max(len(text), 1) < 0.02:
+            if '\ufffd' not in text or text.count('\ufffd') / max(len(text), 1) < 0.02:
                 logger.debug(f"使用备选编码成功: {encoding}")
                 return text, encoding
         except (UnicodeDecodeError, LookupError):
@@ -246,6 +254,26 @@ def smart_decode(
     return data.decode('utf-8', errors='replace'), 'utf-8'
 
 
+def decode_bytes(data: bytes) -> str:
+    """快速解码（不做置信度评估）
+    
+    纯 ASCII 直接解码；否则先按 UTF-8 严格解码，失败再用 GB18030（GB2312/GBK 的超集），
+    都失败时回退到 UTF-8 + errors='replace'。
+    """
+    if not data:
+        return ''
+    if data.isascii():
+        return data.decode('ascii')
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+    try:
+        return data.decode('gb18030')
+    except UnicodeDecodeError:
+        return data.decode('utf-8', errors='replace')
+
+
 def safe_decode(
     data: bytes,
     encoding: str = 'utf-8',
@@ -272,5 +300,6 @@ def safe_decode(
 __all__ = [
     'EncodingDetector',
     'smart_decode',
+    'decode_bytes',
     'safe_decode',
 ]
@@ -2,20 +2,50 @@
 
 import os
 import re
+import shlex
 from datetime import datetime
 from typing import List, Optional, Tuple
 import logging
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
 
+# 远端一次性筛选出 {N} 最大的文件：输出 "N<TAB>路径"；只有文件名匹配、没有有效 N 时输出 "<TAB>第一个匹配文件"，无匹配时不输出
+# 前后缀经环境变量传入：awk -v 会解释反斜杠转义，ENVIRON 原样保留
+_MAX_SLICE_AWK = (
+    'BEGIN {p=ENVIRON["SLICE_PREFIX"]; s=ENVIRON["SLICE_SUFFIX"]} '
+    '{if (first=="") first=$0; name=$0; sub(".*/", "", name); mid_len=length(name)-length(p)-length(s); '
+    'if (mid_len<1 || substr(name,1,length(p))!=p || substr(name,length(name)-length(s)+1)!=s) next; '
+    'mid=substr(name,length(p)+1,mid_len); if (mid !~ /^[0-9]+$/) next; '
+    'if (best=="" || mid+0>max) {max=mid+0; n=mid; best=$0}} '
+    'END {if (best!="") print n "\\t" best; else if (first!="") print "\\t" first}'
+)
+
+
+# find -name 的通配符元字符；模式里的前后缀按字面匹配，需逐个转义
+_GLOB_META_RE = re.compile(r'([\\*?\[\]])')
+
+
+# 支持的占位符；绝大多数路径不含 '{'，先做 O(1) 的字符判断再跑正则
+_PLACEHOLDER_RE = re.compile(r'\{(?:YYYY|MM|DD|N)\}')
+
+
+def has_placeholders(path: str) -> bool:
+    """路径中是否含有 {YYYY}/{MM}/{DD}/{N} 占位符"""
+    return '{' in path and _PLACEHOLDER_RE.search(path) is not None
+
+
+@lru_cache(maxsize=256)
+def _compile_slice_regex(pattern: str) -> re.Pattern:
+    """把含 {N} 的文件名模式编译为正则（N 为捕获组），同一模式只编译一次"""
+    return re.compile('^' + re.escape(pattern).replace(r'\{N\}', r'(\d+)') + '$')
+
+
 class FilenameResolver:
-    def __init__(self):
-        self.date_placeholders = {
-            '{YYYY}': '%Y',
-            '{MM}': '%m',
-            '{DD}': '%d'
-        }
+    # 日期占位符 -> 在 strftime('%Y%m%d') 结果中的切片位置；一次正则扫描完成全部替换
+    _DATE_RE = re.compile(r'\{(YYYY|MM|DD)\}')
+    _DATE_SLICES = {'YYYY': slice(0, 4), 'MM': slice(4, 6), 'DD': slice(6, 8)}
 
     def resolve_filename(self, filename_pattern: str, target_date: Optional[datetime] = None, ssh_conn=None) -> str:
         if target_date is None:
@@ -25,32 +55,36 @@ class FilenameResolver:
             if ssh_conn is None:
                 raise ValueError("处理切片通配符 {N} 需要提供 SSH 连接对象")
             return self._resolve_slice_placeholder(resolved_pattern, ssh_conn)
-        logger.info(f"文件名模式 '{filename_pattern}' 解析为 '{resolved_pattern}'")
+        logger.info("文件名模式 '%s' 解析为 '%s'", filename_pattern, resolved_pattern)
         return resolved_pattern
 
     def _replace_date_placeholders(self, pattern: str, date: datetime) -> str:
-        for placeholder, fmt in self.date_placeholders.items():
-            if placeholder in pattern:
-                pattern = pattern.replace(placeholder, date.strftime(fmt))
-        return pattern
+        if '{' not in pattern:
+            return pattern
+        ymd = date.strftime('%Y%m%d')
+        return self._DATE_RE.sub(lambda m: ymd[self._DATE_SLICES[m.group(1)]], pattern)
 
     def _resolve_slice_placeholder(self, pattern: str, ssh_conn) -> str:
         directory = os.path.dirname(pattern) or '.'
         filename_pattern = os.path.basename(pattern)
         glob_pattern = filename_pattern.replace('{N}', '*')
         directory_unix = directory.replace('\\', '/')
+        best = self._find_max_slice_remote(directory_unix, filename_pattern, ssh_conn)
+        if best:
+            return best
+        # find | awk 执行成功但没有匹配（best 为 ''）时不再列一次目录；只有命令失败（None）才走逐个匹配的旧逻辑
         full_glob_pattern = f"{directory_unix}/{glob_pattern}" if directory_unix != '.' else glob_pattern
-        matching_files = self._find_remote_files(full_glob_pattern, ssh_conn)
+        matching_files = self._find_remote_files(full_glob_pattern, ssh_conn) if best is None else []
         if not matching_files:
             default_filename = pattern.replace('{N}', '0')
             logger.warning(f"未找到匹配的文件，返回默认文件名: {default_filename}")
             return default_filename
         max_n = -1
         best_file = None
-        regex_pattern = self._create_regex_from_pattern(filename_pattern)
+        regex = _compile_slice_regex(filename_pattern)
         for file_path in matching_files:
             filename = os.path.basename(file_path)
-            match = re.match(regex_pattern, filename)
+            match = regex.match(filename)
             if match:
                 try:
                     n_val = int(match.group(1))
@@ -65,10 +99,34 @@ class FilenameResolver:
         logger.warning(f"未找到有效N值，返回第一个匹配文件: {matching_files[0]}")
         return matching_files[0]
 
-    def _create_regex_from_pattern(self, pattern: str) -> str:
-        escaped = re.escape(pattern)
-        regex = escaped.replace(r'\{N\}', r'(\d+)')
-        return f'^{regex}$'
+    def _find_max_slice_remote(self, directory: str, filename_pattern: str, ssh_conn) -> Optional[str]:
+        """一次 SSH 往返在远端完成列目录和取最大 N，只回传一行
+
+        返回匹配的路径；没有匹配文件时返回 ''；远端命令失败时返回 None，交给逐个匹配的旧逻辑。
+        """
+        prefix, suffix = filename_pattern.split('{N}', 1)
+        name_glob = _GLOB_META_RE.sub(r'\\\1', prefix) + '*' + _GLOB_META_RE.sub(r'\\\1', suffix)
+        cmd = (
+            f"find {shlex.quote(directory)} -maxdepth 1 -type f -name {shlex.quote(name_glob)} 2>/dev/null"
+            f" | SLICE_PREFIX={shlex.quote(prefix)} SLICE_SUFFIX={shlex.quote(suffix)} awk {shlex.quote(_MAX_SLICE_AWK)}"
+        )
+        try:
+            stdout, _, code = ssh_conn.execute_command(cmd, timeout=10)
+        except Exception:
+            return None
+        if code != 0:
+            return None
+        n_val, sep, best = stdout.strip('\n').partition('\t')
+        if not sep or not best:
+            return ''
+        # 目录为 '.' 时 find 输出 './name'，与模式本身的写法（及未找到时的默认文件名）保持一致，去掉前缀
+        if directory == '.' and best.startswith('./'):
+            best = best[2:]
+        if n_val:
+            logger.info("找到最新的切片文件: %s (N=%s)", best, n_val)
+        else:
+            logger.warning("未找到有效N值，返回第一个匹配文件: %s", best)
+        return best
 
     def _find_remote_files(self, glob_pattern: str, ssh_conn) -> List[str]:
         try:
@@ -111,6 +169,7 @@ def validate_log_filename_pattern(pattern: str) -> Tuple[bool, List[str]]:
     return len(errors) == 0, errors
 
 __all__ = [
+    'has_placeholders',
     'resolve_log_filename',
     'validate_log_filename_pattern',
     'FilenameResolver'
@@ -0,0 +1,95 @@
+import os
+
+from app.services.config import ConfigService
+
+
+def _write_config(svc, names):
+    svc.save_config({'logs': [{'name': n, 'sshs': [{'host': 'h', 'port': 22, 'username': 'u', 'path': '/a.log'}]} for n in names], 'settings': {}})
+
+
+def test_get_all_logs_cached_until_file_changes(tmp_path):
+    svc = ConfigService(str(tmp_path / 'config.yaml'))
+    _write_config(svc, ['a', 'b'])
+    first = svc.get_all_logs()
+    assert [log.name for log in first] == ['a', 'b']
+    assert svc.get_all_logs() is first
+    _write_config(svc, ['c'])
+    st = os.stat(svc.config_path)
+    os.utime(svc.config_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert [log.name for log in svc.get_all_logs()] == ['c']
+
+
+def test_get_log_by_name_invalidated_by_mtime(tmp_path):
+    svc = ConfigService(str(tmp_path / 'config.yaml'))
+    _write_config(svc, ['a'])
+    log = svc.get_log_by_name('a')
+    assert svc.get_log_by_name('a') is log
+    assert svc.get_log_by_name('missing') is None
+    _write_config(svc, ['b'])
+    st = os.stat(svc.config_path)
+    os.utime(svc.config_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert svc.get_log_by_name('a') is None
+    assert svc.get_log_by_name('b').name == 'b'
+
+
+def test_servers_index_dedupes_endpoints(tmp_path):
+    svc = ConfigService(str(tmp_path / 'config.yaml'))
+    _write_config(svc, ['a', 'b'])
+    index = svc.get_servers_index()
+    assert list(index) == ['u@h:22']
+    assert index['u@h:22'].log_configs == [{'log_name': 'a', 'ssh_index': 0}, {'log_name': 'b', 'ssh_index': 0}]
+    assert svc.get_servers_index() is index
+    assert [ssh['path'] for ssh in svc.get_endpoint_sshs('h', 22, 'u')] == ['/a.log', '/a.log']
+    assert svc.get_endpoint_sshs('h', 2222, 'u') == []
+
+
+def test_load_config_reuses_parse_until_file_changes(tmp_path):
+    svc = ConfigService(str(tmp_path / 'config.yaml'))
+    _write_config(svc, ['a'])
+    cfg = svc.load_config()
+    assert ConfigService(svc.config_path).load_config() is cfg
+    with open(svc.config_path, 'a', encoding='utf-8') as f:
+        f.write('# edited by hand\n')
+    assert svc.load_config() is not cfg
+    assert [log['name'] for log in svc.load_config()['logs']] == ['a']
+
+
+def test_save_config_skips_unchanged_content(tmp_path, monkeypatch):
+    svc = ConfigService(str(tmp_path / 'config.yaml'))
+    _write_config(svc, ['a'])
+    backups = []
+    monkeypatch.setattr(svc, '_backup_config', lambda: backups.append(1))
+    _write_config(svc, ['a'])
+    assert backups == []
+    _write_config(svc, ['b'])
+    assert backups == [1]
+    assert [log['name'] for log in svc.load_config()['logs']] == ['b']
+
+
+def test_leftover_json_sidecar_is_removed(tmp_path):
+    path = str(tmp_path / 'config.yaml')
+    with open(path + '.cache.json', 'w', encoding='utf-8') as f:
+        f.write('{"config": {"logs": [{"password": "secret"}]}}')
+    ConfigService(path)
+    assert not os.path.exists(path + '.cache.json')
+
+
+def test_save_config_caches_a_copy(tmp_path):
+    svc = ConfigService(str(tmp_path / 'config.yaml'))
+    config = {'logs': [{'name': 'a', 'sshs': [{'host': 'h', 'port': 22, 'username': 'u', 'path': '/a.log'}]}], 'settings': {}}
+    svc.save_config(config)
+    config['logs'].append({'name': 'b'})
+    config['logs'][0]['name'] = 'changed'
+    assert [log['name'] for log in svc.load_config()['logs']] == ['a']
+
+
+def test_same_mtime_rewrite_refreshes_logs_and_version(tmp_path):
+    svc = ConfigService(str(tmp_path / 'config.yaml'))
+    _write_config(svc, ['a'])
+    st = os.stat(svc.config_path)
+    assert [log.name for log in svc.get_all_logs()] == ['a']
+    version = svc.version()
+    _write_config(svc, ['a', 'b'])
+    os.utime(svc.config_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert svc.version() != version
+    assert [log.name for log in svc.get_all_logs()] == ['a', 'b']
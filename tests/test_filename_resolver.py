@@ -1,4 +1,4 @@
-from app.services.utils.filename_resolver import resolve_log_filename, validate_log_filename_pattern
+from app.services.utils.filename_resolver import has_placeholders, resolve_log_filename, validate_log_filename_pattern
 
 def test_validate_pattern_ok():
     ok, errors = validate_log_filename_pattern('app-{YYYY}-{MM}-{DD}-{N}.log')
@@ -8,3 +8,50 @@ def test_resolve_without_N(monkeypatch):
     pattern = 'app-{YYYY}.log'
     filename = resolve_log_filename(pattern)
     assert 'app-' in filename and filename.endswith('.log')
+
+def test_has_placeholders():
+    assert has_placeholders('/var/log/app-{YYYY}{MM}{DD}.log')
+    assert has_placeholders('/var/log/app.{N}.log')
+    assert not has_placeholders('/var/log/app.log')
+    assert not has_placeholders('/var/log/{other}.log')
+
+
+class _LocalShell:
+    """Runs resolver commands with the local /bin/sh, standing in for an SSH connection."""
+
+    def __init__(self, cwd):
+        self.cwd = cwd
+        self.commands = []
+
+    def execute_command(self, command, timeout=None):
+        import subprocess
+        self.commands.append(command)
+        proc = subprocess.run(['sh', '-c', command], cwd=self.cwd, capture_output=True, text=True, timeout=timeout)
+        return proc.stdout, proc.stderr, proc.returncode
+
+
+def _touch(directory, *names):
+    for name in names:
+        (directory / name).write_text('')
+
+
+def test_resolve_N_picks_largest_slice_in_one_call(tmp_path):
+    _touch(tmp_path, 'app.1.log', 'app.12.log', 'app.3.log', 'app.x.log')
+    conn = _LocalShell(tmp_path)
+    assert resolve_log_filename(f'{tmp_path}/app.{{N}}.log', ssh_conn=conn) == f'{tmp_path}/app.12.log'
+    assert len(conn.commands) == 1
+
+
+def test_resolve_N_without_matches_skips_fallback_listing(tmp_path):
+    conn = _LocalShell(tmp_path)
+    assert resolve_log_filename(f'{tmp_path}/app.{{N}}.log', ssh_conn=conn) == f'{tmp_path}/app.0.log'
+    assert len(conn.commands) == 1
+
+
+def test_resolve_N_keeps_backslashes_and_strips_dot_prefix(tmp_path):
+    _touch(tmp_path, 'a\\tb.2.log', 'a\\tb.7.log', 'only.x.log')
+    conn = _LocalShell(tmp_path)
+    assert resolve_log_filename('a\\tb.{N}.log', ssh_conn=conn) == 'a\\tb.7.log'
+    # glob matches but no numeric {N}: first match is returned, still from the single call
+    assert resolve_log_filename('only.{N}.log', ssh_conn=conn) == 'only.x.log'
+    assert len(conn.commands) == 2
@@ -0,0 +1,28 @@
+import json
+
+import pytest
+from flask import Flask
+
+from app.middleware import configure_json
+
+pytest.importorskip('orjson')
+
+
+def _provider():
+    app = Flask(__name__)
+    configure_json(app)
+    return app.json
+
+
+def test_orjson_dumps_honours_supported_kwargs():
+    provider = _provider()
+    data = {'b': 1, 'a': object()}
+    assert provider.dumps({'b': 1, 'a': 2}, sort_keys=False) == '{"b":1,"a":2}'
+    assert provider.dumps({'a': [1]}, indent=2) == json.dumps({'a': [1]}, indent=2)
+    assert provider.dumps(data, default=lambda o: 'x') == '{"a":"x","b":1}'
+
+
+def test_orjson_dumps_falls_back_for_unsupported_kwargs():
+    provider = _provider()
+    assert provider.dumps({'a': '中'}, indent=4) == json.dumps({'a': '中'}, indent=4)
+    assert provider.dumps({'a': '中'}, ensure_ascii=True) == '{"a": "\\u4e2d"}'
@@ -9,3 +9,69 @@ def test_search_params_invalid_context():
     sp = SearchParams(context_span=100)
     with pytest.raises(ValueError):
         sp.validate()
+
+def test_ere_only_regex_not_rejected_by_python_check(monkeypatch):
+    # "*ERROR" is valid for grep -E but not for Python re; it must still reach the hosts
+    from app.services.log.search import LogSearchService
+    svc = LogSearchService()
+    monkeypatch.setattr(svc.ssh_manager, 'get_connection', lambda cfg: None)
+    sp = SearchParams(keyword='*ERROR', use_regex=True)
+    result = svc.search_multi_host({'name': 'demo', 'sshs': [{'host': 'h', 'username': 'u'}]}, sp)
+    assert result.hosts[0].error == 'SSH连接失败'
+
+
+def _search_with_exit(monkeypatch, keyword, use_regex, stderr, code):
+    from app.services.log.search import LogSearchService
+    svc = LogSearchService()
+
+    class Conn:
+        remote_encoding = 'utf-8'
+
+        def execute_command_bytes(self, command, timeout=None):
+            return b'', stderr, code
+
+    monkeypatch.setattr(svc.ssh_manager, 'get_connection', lambda cfg: Conn())
+    sp = SearchParams(keyword=keyword, use_regex=use_regex)
+    return svc.search_multi_host({'name': 'demo', 'sshs': [{'host': 'h', 'username': 'u', 'path': '/a.log'}]}, sp).hosts[0]
+
+
+def test_grep_regex_error_reported_per_host(monkeypatch):
+    host = _search_with_exit(monkeypatch, '(unclosed', True, b'grep: Unmatched ( or \\(\n', 2)
+    assert not host.success and 'Unmatched' in host.error
+
+
+@pytest.mark.parametrize('use_regex', [False, True])
+def test_grep_error_exit_fails_host_in_both_modes(monkeypatch, use_regex):
+    host = _search_with_exit(monkeypatch, 'err.r', use_regex, b'grep: /a.log: Permission denied\n', 2)
+    assert not host.success and 'Permission denied' in host.error
+
+
+@pytest.mark.parametrize('use_regex', [False, True])
+def test_grep_no_match_exit_is_empty_success(monkeypatch, use_regex):
+    host = _search_with_exit(monkeypatch, 'err.r', use_regex, b'', 1)
+    assert host.success and host.results == []
+
+
+def test_search_command_exits_with_grep_status():
+    from app.services.log.search import _command_template
+    cmd = _command_template('keyword', False, 0, False, True).format(file='/a.log', kw='x')
+    assert cmd.startswith('exec 4>&1; rc=$({ { grep -nF x /a.log; echo $? >&3; } | tail -n ')
+    assert cmd.endswith(' >&4; } 3>&1); exit $rc')
+
+def test_parse_grep_output_strips_line_numbers():
+    from app.services.log.search import LogSearchService
+    svc = LogSearchService()
+    out = "12:first\n--\n13-  before\n14=after\n15:\n\n  plain line\n"
+    assert svc._parse_grep_output(out) == ['first', 'before', 'after', '', 'plain line']
+    assert svc._parse_grep_output(out, has_line_numbers=False) == ['12:first', '--', '13-  before', '14=after', '15:', '  plain line']
+
+
+def test_parse_linux_find_output_keeps_tabs_in_names():
+    from app.services.log.search import LogSearchService
+    svc = LogSearchService()
+    out = "12\t2024-01-02 03:04:05.0\t2024-01-01 00:00:00.0\t/var/log/a\tb.log\n\n3\tm\tc\t/var/log/c.log\n"
+    files = svc._parse_linux_find_output(out, 'h')
+    assert [(f['filename'], f['full_path'], f['size'], f['modified_time']) for f in files] == [
+        ('a\tb.log', '/var/log/a\tb.log', 12, '2024-01-02 03:04:05.0'),
+        ('c.log', '/var/log/c.log', 3, 'm'),
+    ]
@@ -0,0 +1,24 @@
+import os
+
+from flask import Flask
+
+from app.api.routes import servers
+from app.services import ConfigService
+
+
+def test_list_servers_cached_per_config_version(tmp_path, monkeypatch):
+    svc = ConfigService(str(tmp_path / 'config.yaml'))
+    svc.save_config({'logs': [{'name': 'a', 'sshs': [{'host': 'h1', 'port': 22, 'username': 'u', 'path': '/a.log'}]}]})
+    monkeypatch.setattr(servers, '_config_service', svc)
+    monkeypatch.setattr(servers, '_servers_cache', (None, None))
+    first = servers._aggregate_servers()
+    calls = []
+    monkeypatch.setattr(servers, '_aggregate_servers', lambda: calls.append(1) or first)
+    view = servers.list_servers.__wrapped__
+    with Flask(__name__).test_request_context('/servers'):
+        assert view() is first and view() is first
+        assert len(calls) == 1
+        st = os.stat(svc.config_path)
+        os.utime(svc.config_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        view()
+        assert len(calls) == 2
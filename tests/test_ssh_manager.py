@@ -0,0 +1,136 @@
+import threading
+import time
+
+from app.services.ssh import manager
+from app.services.ssh.manager import SSHConnection, SSHConnectionManager
+
+
+def _fake_connect(self):
+    self.connected = True
+    self.client = object()
+    return True
+
+
+def _cfg(host):
+    return {'host': host, 'port': 22, 'username': 'u'}
+
+
+def test_pool_reuses_and_evicts_lru(monkeypatch):
+    monkeypatch.setattr(SSHConnection, 'connect', _fake_connect)
+    monkeypatch.setattr(SSHConnection, 'is_alive', lambda self: self.connected)
+    monkeypatch.setattr(SSHConnection, 'close', lambda self: setattr(self, 'connected', False))
+    pool = SSHConnectionManager(max_connections=2)
+    a = pool.get_connection(_cfg('a'))
+    assert pool.get_connection(_cfg('a')) is a
+    b = pool.get_connection(_cfg('b'))
+    pool.get_connection(_cfg('a'))  # a becomes most recently used
+    pool.get_connection(_cfg('c'))
+    assert not b.connected and a.connected
+    assert set(pool.connections) == {'a:22:u', 'c:22:u'}
+
+
+def test_pool_drops_idle_connections(monkeypatch):
+    monkeypatch.setattr(SSHConnection, 'connect', _fake_connect)
+    monkeypatch.setattr(SSHConnection, 'is_alive', lambda self: self.connected)
+    monkeypatch.setattr(SSHConnection, 'close', lambda self: setattr(self, 'connected', False))
+    pool = SSHConnectionManager()
+    a = pool.get_connection(_cfg('a'))
+    a.last_used = time.time() - manager.CONNECTION_IDLE_TIMEOUT - 1
+    assert pool.get_connection(_cfg('a')) is not a
+    assert not a.connected
+
+
+def test_concurrent_get_connection_connects_once_per_host(monkeypatch):
+    calls = []
+    # a, b and c can only pass the barrier together: if handshakes ran one after another
+    # under the pool lock, the barrier would break and the connects would fail
+    barrier = threading.Barrier(3, timeout=5)
+
+    def parallel_connect(self):
+        calls.append(self.config['host'])
+        barrier.wait()
+        return _fake_connect(self)
+
+    monkeypatch.setattr(SSHConnection, 'connect', parallel_connect)
+    monkeypatch.setattr(SSHConnection, 'is_alive', lambda self: self.connected)
+    pool = SSHConnectionManager()
+    got = []
+    threads = [threading.Thread(target=lambda h=h: got.append(pool.get_connection(_cfg(h)))) for h in ('a', 'a', 'a', 'b', 'c')]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(calls) == ['a', 'b', 'c']
+    assert len(got) == 5 and len({id(c) for c in got}) == 3
+
+
+def test_slow_close_of_stale_connection_does_not_block_pool(monkeypatch):
+    closing = threading.Event()
+    release = threading.Event()
+
+    def blocking_close(self):
+        closing.set()
+        release.wait(5)
+        self.connected = False
+
+    monkeypatch.setattr(SSHConnection, 'connect', _fake_connect)
+    monkeypatch.setattr(SSHConnection, 'is_alive', lambda self: self.connected)
+    monkeypatch.setattr(SSHConnection, 'close', blocking_close)
+    pool = SSHConnectionManager()
+    a = pool.get_connection(_cfg('a'))
+    b = pool.get_connection(_cfg('b'))
+    a.last_used = time.time() - manager.CONNECTION_IDLE_TIMEOUT - 1
+    closer = threading.Thread(target=pool.get_connection, args=(_cfg('a'),))
+    closer.start()
+    try:
+        assert closing.wait(5)
+        # the stale connection is still closing, yet the pool lock is free and other hosts are served
+        assert pool.lock.acquire(timeout=5)
+        pool.lock.release()
+        assert pool.get_connection(_cfg('b')) is b
+    finally:
+        release.set()
+        closer.join()
+    assert not a.connected
+
+
+class _FakeSFTPHandle:
+    MAX_REQUEST_SIZE = 4
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.windows = []
+        self.closed = False
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_data = {}
+
+    def tell(self):
+        return self.pos
+
+    def read(self, size):
+        out = self.data[self.pos:self.pos + size]
+        self.pos += len(out)
+        return out
+
+    def readv(self, chunks):
+        for offset, size in chunks:
+            self.windows.append(size)
+            self.pos = offset
+            yield self.read(size)
+
+    def close(self):
+        self.closed = True
+
+
+def test_sftp_readahead_reads_in_bounded_windows():
+    data = bytes(range(50))
+    handle = _FakeSFTPHandle(data)
+    handle._prefetch_data[0] = b'stale'
+    stream = manager.SFTPReadahead(handle, 40, max_requests=2)
+    assert b''.join(iter(lambda: stream.read(3), b'')) == data
+    # 40 bytes of stat'ed size in 8-byte windows; bytes appended afterwards are read directly
+    assert handle.windows == [8, 8, 8, 8, 8]
+    assert handle._prefetch_data == {}
+    stream.close()
+    assert handle.closed